@@ -10,12 +10,27 @@ import asyncio
 import time
 import uuid
 import threading
-from collections import deque
-from typing import Optional, Dict, Any
+import struct
+import array
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, replace
+from typing import Optional, Dict, Any, Tuple, Union
 import logging
 
 # Set execution and reduce logs before imports
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
+# OpenMP reads its thread count once, when onnxruntime/torch are first imported,
+# so the two flags it depends on are read here rather than after parse_args().
+_thread_parser = argparse.ArgumentParser(add_help=False)
+_thread_parser.add_argument("--mode", default="cpu")
+_thread_parser.add_argument("--intra-op-threads", type=int, default=0)
+_thread_args, _ = _thread_parser.parse_known_args()
+if _thread_args.intra_op_threads > 0:
+    os.environ['OMP_NUM_THREADS'] = str(_thread_args.intra_op_threads)
+elif _thread_args.mode == 'gpu':
+    os.environ['OMP_NUM_THREADS'] = '1'  # Single thread for better CUDA performance
 
 import cv2
 import numpy as np
@@ -27,6 +42,32 @@ from PIL import Image
 
 import uvicorn
 
+try:
+    import zstandard as zstd  # Optional: compression for raw frames over WAN links
+except ImportError:
+    zstd = None
+
+try:
+    # Optional: libjpeg-turbo (SIMD) codec, ~2-3x faster than OpenCV's bundled libjpeg
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420, TJFLAG_FASTDCT
+    turbo_jpeg = TurboJPEG()
+except Exception:
+    turbo_jpeg = None
+
+try:
+    # Optional: WebRTC transport (H.264/VP8 with congestion control) via /offer
+    from aiortc import RTCPeerConnection, RTCSessionDescription, MediaStreamTrack
+    from aiortc.contrib.media import MediaRelay
+    from av import VideoFrame
+except ImportError:
+    RTCPeerConnection = None
+
+try:
+    # Optional: nvJPEG via nvImageCodec, used in GPU mode to move the codec onto the GPU
+    from nvidia import nvimgcodec
+except Exception:
+    nvimgcodec = None
+
 # Add parent directory to path to import Deep-Live-Cam modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -34,25 +75,83 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import modules.globals
 import modules.metadata
 import modules.face_analyser
-from modules.processors.frame.core import get_frame_processors_modules
+from modules.processors.frame.core import get_frame_processors_modules, load_frame_processor_module
 from modules.face_analyser import get_one_face, get_many_faces
+from modules.processors.frame import face_swapper as face_swapper_processor
+from modules.processors.frame.face_swapper import swap_faces_batched, swap_frames_batched, FRAME_SWAPPER_MUTATES_INPUT
+try:
+    from modules.processors.frame.face_enhancer import enhance_face
+except ImportError:
+    # Face enhancer (GFPGAN/torch) not installed
+    enhance_face = None
 from modules.utilities import is_image
 from modules.core import update_status
 
+TRT_ENGINE_CACHE_PATH = "./trt_cache"
+
+
+def _provider_name(provider: Any) -> str:
+    """Execution providers may be plain names or (name, options) tuples."""
+    return provider[0] if isinstance(provider, tuple) else provider
+
+
+def _available_onnxruntime_providers() -> list:
+    try:
+        import onnxruntime as ort  # type: ignore
+
+        return ort.get_available_providers()
+    except Exception:
+        return []
+
+
 # Configuration class
 class ServerConfig:
-    def __init__(self, mode: str = "cpu"):
+    def __init__(self, mode: str = "cpu", use_tensorrt: bool = True, trt_fp16: bool = False):
         self.mode = mode.lower()
+        self.use_tensorrt = use_tensorrt
+        self.trt_fp16 = trt_fp16
         self.setup_execution_providers()
         self.setup_globals()
 
     def setup_execution_providers(self):
         """Configure execution providers based on mode"""
         if self.mode == "gpu":
-            # GPU mode - CUDA preferred
-            os.environ['OMP_NUM_THREADS'] = '1'  # Single thread for better CUDA performance
-            modules.globals.execution_providers = ['CUDAExecutionProvider', 'CPUExecutionProvider']
-            print(f"GPU mode enabled - Using CUDA acceleration")
+            # onnxruntime silently falls back to CPU when the CUDA EP isn't
+            # registered (CPU-only wheel installed, or CUDA/cuDNN mismatch).
+            available = _available_onnxruntime_providers()
+            if 'CUDAExecutionProvider' not in available:
+                print("=" * 60)
+                print("⚠ WARNING: GPU mode requested but CUDAExecutionProvider is not available")
+                print(f"  onnxruntime providers: {available}")
+                print("  Install the onnxruntime-gpu wheel matching your CUDA version")
+                print("  (see DEPLOYMENT_GUIDE.md). Falling back to CPU mode.")
+                print("=" * 60)
+                self.mode = "cpu"
+
+        if self.mode == "gpu":
+            # GPU mode - CUDA preferred (OMP_NUM_THREADS is pinned at import time).
+            # cudnn_conv_algo_search=DEFAULT takes cuDNN's default algorithm; ORT's own default
+            # (EXHAUSTIVE) benchmarks every conv for each new input shape, costing seconds.
+            modules.globals.execution_providers = [('CUDAExecutionProvider', {
+                'device_id': 0,
+                'cudnn_conv_algo_search': 'DEFAULT',
+                'do_copy_in_default_stream': True,
+                'arena_extend_strategy': 'kNextPowerOfTwo',
+            }), 'CPUExecutionProvider']
+            if self.use_tensorrt and 'TensorrtExecutionProvider' in available:
+                # Engines are cached on disk so only the first start pays the build cost.
+                # fp16 engines only with --precision fp16, like the fp16 model (GPU distortion issues).
+                engine_precision = "fp16" if self.trt_fp16 else "fp32"
+                engine_cache_path = os.path.join(TRT_ENGINE_CACHE_PATH, engine_precision)
+                modules.globals.execution_providers.insert(0, ('TensorrtExecutionProvider', {
+                    'trt_fp16_enable': self.trt_fp16,
+                    'trt_engine_cache_enable': True,
+                    'trt_engine_cache_path': engine_cache_path,
+                }))
+                print(f"GPU mode enabled - Using TensorRT {engine_precision} "
+                      f"(engine cache: {engine_cache_path}) with CUDA fallback")
+            else:
+                print(f"GPU mode enabled - Using CUDA acceleration")
         else:
             # CPU mode
             modules.globals.execution_providers = ['CPUExecutionProvider']
@@ -89,21 +188,54 @@ source_face_cache = None
 face_swapper = None
 connected_clients = set()
 
+# In --workers mode, uploads land on one worker; the others pick up the new source
+# image from disk by watching the marker file's mtime.
+WORKER_ARGS_ENV = "DLC_SERVER_WORKER_ARGS"
+SOURCE_MARKER_PATH = os.path.join("uploads", ".current_source")
+shared_source_sync = False
+_source_marker_mtime = None
+
 # Model inference in InsightFace/onnxruntime can be unsafe under concurrent calls.
 # Serialize frame processing to keep live (/ws) and batch (/process-video) stable.
 processing_lock = threading.Lock()
 
+# Gate inference on the event loop so concurrent clients queue for the model
+# instead of piling up executor threads that contend for ORT's intra-op pool.
+inference_semaphore = asyncio.Semaphore(1)
+
+# Dedicated executors for the /ws pipeline, so codec work for frame N+1 overlaps
+# inference on frame N instead of queueing behind it in the default executor.
+DECODE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="decode")
+ENCODE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="encode")
+INFERENCE_POOL: Optional[ThreadPoolExecutor] = None  # sized by mode in configure_server()
+
+
+def _run_in_pool(pool: Optional[ThreadPoolExecutor], func, *args, **kwargs):
+    return asyncio.get_running_loop().run_in_executor(pool, functools.partial(func, *args, **kwargs))
+
 
 class RollingMs:
     def __init__(self, maxlen: int = 180):
-        self._values: deque[float] = deque(maxlen=maxlen)
+        self._buf = np.empty(maxlen, dtype=np.float32)
+        self._maxlen = maxlen
+        self._i = 0
+        self._count = 0
+        self._writes = 0
+        self._summary: Optional[Dict[str, Any]] = None
+        self._summary_writes = -1
 
     def add(self, ms: float) -> None:
-        self._values.append(float(ms))
+        self._buf[self._i] = ms
+        self._i = (self._i + 1) % self._maxlen
+        self._count = min(self._count + 1, self._maxlen)
+        self._writes += 1
 
     def summary(self) -> Dict[str, Any]:
-        if not self._values:
-            return {
+        # /status polls far more often than some stages record; reuse the last result.
+        if self._summary_writes == self._writes:
+            return self._summary
+        if not self._count:
+            summary = {
                 "count": 0,
                 "avg_ms": None,
                 "p50_ms": None,
@@ -111,24 +243,20 @@ class RollingMs:
                 "max_ms": None,
                 "last_ms": None,
             }
-        vals = list(self._values)
-        vals_sorted = sorted(vals)
-        n = len(vals_sorted)
-
-        def _percentile(p: float) -> float:
-            if n == 1:
-                return vals_sorted[0]
-            idx = int(round((p / 100.0) * (n - 1)))
-            return vals_sorted[max(0, min(n - 1, idx))]
-
-        return {
-            "count": n,
-            "avg_ms": sum(vals) / n,
-            "p50_ms": _percentile(50),
-            "p95_ms": _percentile(95),
-            "max_ms": max(vals),
-            "last_ms": vals[-1],
-        }
+        else:
+            vals = self._buf[: self._count]
+            p50, p95 = np.percentile(vals, [50, 95])
+            summary = {
+                "count": self._count,
+                "avg_ms": float(vals.mean()),
+                "p50_ms": float(p50),
+                "p95_ms": float(p95),
+                "max_ms": float(vals.max()),
+                "last_ms": float(self._buf[(self._i - 1) % self._maxlen]),
+            }
+        self._summary = summary
+        self._summary_writes = self._writes
+        return summary
 
 
 profiling_enabled = False
@@ -145,22 +273,87 @@ timings: Dict[str, RollingMs] = {
     "loop_total": RollingMs(),
 }
 
-perf_counters: Dict[str, int] = {
-    "frames_received": 0,
-    "frames_decoded": 0,
-    "frames_decode_failed": 0,
-    "frames_processed": 0,
-    "frames_skipped": 0,
-    "frames_encoded": 0,
-    "frames_sent": 0,
-}
+# Per-frame counters live in a flat array indexed by the CNT_* constants, so an
+# increment is an indexed C write rather than a dict lookup; /status zips the names back.
+_COUNTER_NAMES = (
+    "frames_received",
+    "frames_decoded",
+    "frames_decode_failed",
+    "frames_dropped_total",
+    "frames_processed",
+    "frames_skipped",
+    "frames_reused",
+    "frames_encoded",
+    "frames_sent",
+)
+(
+    CNT_FRAMES_RECEIVED,
+    CNT_FRAMES_DECODED,
+    CNT_FRAMES_DECODE_FAILED,
+    CNT_FRAMES_DROPPED_TOTAL,
+    CNT_FRAMES_PROCESSED,
+    CNT_FRAMES_SKIPPED,
+    CNT_FRAMES_REUSED,
+    CNT_FRAMES_ENCODED,
+    CNT_FRAMES_SENT,
+) = range(len(_COUNTER_NAMES))
+_COUNTERS = array.array("q", [0] * len(_COUNTER_NAMES))
+
+
+def _counters_snapshot() -> Dict[str, int]:
+    return dict(zip(_COUNTER_NAMES, _COUNTERS))
+
+
+# Near-duplicate reuse (--reuse-threshold): a processed frame is re-sent when a new input's
+# perceptual hash is within this Hamming distance of a cached one. 0 disables the cache.
+reuse_threshold = 0
+REUSE_CACHE_SIZE = 16
+
+
+def _phash(frame: np.ndarray) -> int:
+    """64-bit DCT perceptual hash (the pHash construction, without needing opencv-contrib)."""
+    small = cv2.resize(frame, (32, 32), interpolation=cv2.INTER_AREA)
+    low = cv2.dct(np.float32(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)))[:8, :8]
+    return int.from_bytes(np.packbits(low > np.median(low)).tobytes(), "big")
+
+
+class FrameReuseCache:
+    """Small LRU of processed frames keyed by the perceptual hash of their input frame."""
+
+    def __init__(self, threshold: int, size: int = REUSE_CACHE_SIZE):
+        self.threshold = threshold
+        self.size = size
+        self._entries: OrderedDict[int, np.ndarray] = OrderedDict()
+        self._source = None
+        self._enhancer = None
+
+    def lookup(self, key: int, source: Any, enhancer: bool) -> Optional[np.ndarray]:
+        # Outputs are only valid for the source face and settings they were made with.
+        if source is not self._source or enhancer != self._enhancer:
+            self._entries.clear()
+            self._source = source
+            self._enhancer = enhancer
+            return None
+        for cached_key, frame in self._entries.items():
+            if bin(key ^ cached_key).count("1") <= self.threshold:
+                self._entries.move_to_end(cached_key)
+                return frame
+        return None
+
+    def insert(self, key: int, frame: np.ndarray) -> None:
+        self._entries[key] = frame
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.size:
+            self._entries.popitem(last=False)
 
 
 def _ms_since(start: float) -> float:
     return (time.perf_counter() - start) * 1000.0
 
 
+@functools.lru_cache(maxsize=1)
 def _safe_onnxruntime_info() -> Dict[str, Any]:
+    # Providers and device can't change within a process, so this is computed once.
     try:
         import onnxruntime as ort  # type: ignore
 
@@ -179,6 +372,15 @@ def _safe_onnxruntime_info() -> Dict[str, Any]:
 
 
 def _safe_insightface_session_info() -> Dict[str, Any]:
+    # Sessions only change when the analyser or swapper object is replaced, so /status
+    # polls reuse the last walk over the models until one of them is.
+    analyser = modules.face_analyser.FACE_ANALYSER
+    swapper = getattr(face_swapper_processor, "FACE_SWAPPER", None)
+    return _insightface_session_info(id(analyser), id(swapper))
+
+
+@functools.lru_cache(maxsize=1)
+def _insightface_session_info(_analyser_id: int, _swapper_id: int) -> Dict[str, Any]:
     info: Dict[str, Any] = {}
 
     # Face analyser sessions
@@ -230,27 +432,302 @@ def _safe_insightface_session_info() -> Dict[str, Any]:
 
     return info
 
-# Dynamic processing parameters
-processing_params = {
-    "video_quality": 80,
-    "frame_skip": 1,
-    "target_fps": 30,
-    "enable_face_enhancer": False,
-    "max_faces": 1,
-    "processing_resolution": (640, 480)
-}
+# Dynamic processing parameters. Instances are immutable: /update-parameters builds a
+# new one and rebinds PARAMS, so the per-frame code reads attributes off a snapshot
+# without locking.
+@dataclass(frozen=True, slots=True)
+class RuntimeParams:
+    video_quality: int = 80
+    frame_skip: int = 1
+    # When > 0, frame_skip is derived from measured inference time to meet this budget
+    target_latency_ms: int = 0
+    target_fps: int = 30
+    enable_face_enhancer: bool = False
+    max_faces: int = 1
+    processing_resolution: tuple = (640, 480)
+    # Face detection runs on a proxy frame this wide (0 = full processing resolution)
+    detection_width: int = 320
+    # Run the full detector every N processed frames; track faces in between
+    detection_interval: int = 5
+
+
+PARAMS = RuntimeParams()
+
+# Set by --processing-resolution: the resolution (and so the detector's det_size)
+# is fixed for the server's lifetime and /update-parameters may not change it.
+processing_resolution_pinned = False
+
+
+def _parse_resolution(value: str) -> tuple:
+    """argparse type for WxH resolutions, e.g. 640x480."""
+    try:
+        w, h = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WxH, got {value!r}")
+    if w <= 0 or h <= 0:
+        raise argparse.ArgumentTypeError(f"resolution must be positive, got {value!r}")
+    return (w, h)
+
+
+# Raw binary frame protocol (selected per connection with /ws?format=raw).
+# Each message is a 12-byte little-endian header followed by the pixel payload:
+# width:uint16, height:uint16, stride:uint16, fmt:uint8, flags:uint8, pts:uint32
+RAW_FRAME_HEADER = struct.Struct("<HHHBBI")
+RAW_FMT_BGR = 0
+RAW_FMT_I420 = 1  # planar Y, U, V (4:2:0); stride is the Y row stride
+RAW_FLAG_ZSTD = 0x01
+
+# Wire format used when a /ws client doesn't pass ?format= (set by --wire-format).
+# "yuv420" takes JPEG frames in and returns I420 frames with the raw header.
+default_wire_format = "jpeg"
+
+
+def _decode_raw_frame(data: bytes) -> Optional[tuple]:
+    """Parse a raw frame message into (frame, pts, compressed) without any image decode."""
+    if len(data) < RAW_FRAME_HEADER.size:
+        return None
+    width, height, stride, fmt, flags, pts = RAW_FRAME_HEADER.unpack_from(data)
+    if fmt != RAW_FMT_BGR or width == 0 or height == 0 or stride < width * 3:
+        return None
 
+    payload = memoryview(data)[RAW_FRAME_HEADER.size:]
+    compressed = bool(flags & RAW_FLAG_ZSTD)
+    if compressed:
+        if zstd is None:
+            return None
+        payload = zstd.ZstdDecompressor().decompress(payload, max_output_size=stride * height)
+
+    if len(payload) < stride * height:
+        return None
+    rows = np.frombuffer(payload, np.uint8, count=stride * height).reshape(height, stride)
+    frame = rows[:, : width * 3].reshape(height, width, 3)
+    return frame, pts, compressed
+
+
+def _encode_raw_frame(frame: np.ndarray, pts: int, compress: bool) -> bytes:
+    """Pack a BGR frame into a raw frame message (optionally zstd level 1)."""
+    frame = np.ascontiguousarray(frame)
+    height, width = frame.shape[:2]
+    flags = 0
+    payload = frame.data
+    if compress and zstd is not None:
+        payload = zstd.ZstdCompressor(level=1).compress(payload)
+        flags |= RAW_FLAG_ZSTD
+    header = RAW_FRAME_HEADER.pack(width, height, width * 3, RAW_FMT_BGR, flags, pts & 0xFFFFFFFF)
+    # join() copies header and pixels into the message once (header + bytes() copied twice)
+    return b"".join((header, payload))
+
+
+def _encode_i420_frame(frame: np.ndarray, pts: int) -> bytes:
+    """Pack a BGR frame as I420 (one SIMD color conversion instead of a JPEG encode)."""
+    height, width = frame.shape[:2]
+    # 4:2:0 needs even dimensions; drop the odd row/column if there is one.
+    width &= ~1
+    height &= ~1
+    yuv = cv2.cvtColor(frame[:height, :width], cv2.COLOR_BGR2YUV_I420)
+    header = RAW_FRAME_HEADER.pack(width, height, width, RAW_FMT_I420, 0, pts & 0xFFFFFFFF)
+    return b"".join((header, yuv.data))
+
+
+# JPEG codec backend for the WebSocket path: "nvimgcodec", "turbojpeg" or "opencv".
+jpeg_backend = "turbojpeg" if turbo_jpeg is not None else "opencv"
+_nv_decoder = None
+_nv_encoder = None
+
+
+def _select_jpeg_backend(requested: str, mode: str) -> str:
+    """Resolve --jpeg-codec to an available backend (auto prefers nvJPEG in GPU mode)."""
+    global _nv_decoder, _nv_encoder
+
+    if requested == "auto":
+        if mode == "gpu" and nvimgcodec is not None:
+            requested = "nvimgcodec"
+        elif turbo_jpeg is not None:
+            requested = "turbojpeg"
+        else:
+            requested = "opencv"
+
+    if requested == "nvimgcodec":
+        if nvimgcodec is None:
+            print("⚠ nvImageCodec not installed - falling back to CPU JPEG codec")
+            return _select_jpeg_backend("auto", "cpu")
+        _nv_decoder = nvimgcodec.Decoder()
+        _nv_encoder = nvimgcodec.Encoder()
+    elif requested == "turbojpeg" and turbo_jpeg is None:
+        print("⚠ PyTurboJPEG not installed - falling back to OpenCV JPEG codec")
+        return "opencv"
+    return requested
+
+
+def _decode_jpeg(data: bytes) -> Optional[np.ndarray]:
+    if jpeg_backend == "nvimgcodec":
+        image = _nv_decoder.decode(data)
+        if image is None:
+            return None
+        # nvJPEG decodes to RGB on the device; the pipeline works in BGR on the host.
+        return np.ascontiguousarray(np.asarray(image.cpu())[:, :, ::-1])
+    if jpeg_backend == "turbojpeg":
+        try:
+            return turbo_jpeg.decode(data, pixel_format=TJPF_BGR)
+        except Exception:
+            return None
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _encode_jpeg(frame: np.ndarray, quality: int) -> Optional[Union[bytes, memoryview]]:
+    if jpeg_backend == "nvimgcodec":
+        rgb = np.ascontiguousarray(frame[:, :, ::-1])
+        return _nv_encoder.encode(rgb, "jpeg", params=nvimgcodec.EncodeParams(quality=quality))
+    if jpeg_backend == "turbojpeg":
+        return turbo_jpeg.encode(
+            frame, quality=quality, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420, flags=TJFLAG_FASTDCT
+        )
+    ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    # Hand the encoder's buffer straight to the socket instead of copying it via tobytes();
+    # cast('B') flattens imencode's (N, 1) array to a plain 1-D byte view.
+    return memoryview(buffer).cast('B') if ok else None
 
-def _set_detector_size_from_resolution(resolution: Any) -> None:
+
+# /update-parameters snaps processing_resolution to one of these, so the detector
+# only ever sees a handful of input sizes.
+ALLOWED_PROCESSING_RESOLUTIONS = ((320, 240), (480, 360), (640, 480), (960, 720))
+
+
+def _snap_resolution(resolution: Any) -> Tuple[int, int]:
+    """Closest allowed processing resolution by pixel count."""
+    area = int(resolution[0]) * int(resolution[1])
+    return min(ALLOWED_PROCESSING_RESOLUTIONS, key=lambda r: abs(r[0] * r[1] - area))
+
+
+# Source uploads are detected at insightface's usual size: the streaming detector is
+# sized for detection_width proxies and misses small faces in large photos.
+SOURCE_DETECTOR_SIZE = (640, 640)
+
+
+def _detect_source_face(image: np.ndarray) -> Any:
+    """Detect the face of a source image, under processing_lock like every other inference.
+
+    With IOBinding the sessions share one binding, so no two inferences may overlap.
+    """
+    with processing_lock:
+        return get_one_face(image, det_size=SOURCE_DETECTOR_SIZE)
+
+
+def _set_detector_size_from_resolution(resolution: Any) -> bool:
+    """Set the detector size for a processing resolution; True if it changed."""
     try:
         if resolution is None:
-            return
+            return False
         w, h = resolution
-        side = int(max(64, min(1280, max(int(w), int(h)))))
+        w, h = int(w), int(h)
+        detection_width = int(PARAMS.detection_width or 0)
+        if detection_width and w > detection_width:
+            h = max(1, h * detection_width // w)
+            w = detection_width
+        side = int(max(64, min(1280, max(w, h))))
+        if tuple(modules.globals.detector_size) == (side, side):
+            return False
         modules.globals.detector_size = (side, side)
+        return True
     except Exception:
         # Keep previous detector size if parsing fails
-        return
+        return False
+
+_FACE_POINT_FIELDS = ("bbox", "kps", "landmark_2d_106", "landmark_3d_68")
+
+
+def _scale_face(face: Any, scale: float) -> None:
+    """Map a face detected on a downscaled proxy frame back to full-frame coordinates."""
+    for field in _FACE_POINT_FIELDS:
+        value = face.get(field)
+        if value is not None:
+            face[field] = value * scale
+
+
+# Between detector runs, faces are followed by template-matching their previous
+# grayscale patch in a search window around the last bbox (no contrib trackers needed).
+TRACK_MIN_SCORE = 0.6
+
+
+def _face_template(gray: np.ndarray, face: Any) -> Optional[tuple]:
+    h, w = gray.shape[:2]
+    x1, y1, x2, y2 = face.bbox.astype(int)
+    x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+    if x2 - x1 < 8 or y2 - y1 < 8:
+        return None
+    return gray[y1:y2, x1:x2].copy(), (x1, y1)
+
+
+def _shift_face(face: Any, dx: float, dy: float) -> None:
+    face["bbox"] = face.bbox + np.array([dx, dy, dx, dy], dtype=face.bbox.dtype)
+    for field in ("kps", "landmark_2d_106", "landmark_3d_68"):
+        value = face.get(field)
+        if value is not None:
+            value = value.copy()
+            value[:, 0] += dx
+            value[:, 1] += dy
+            face[field] = value
+
+
+class FaceTracker:
+    """Tracking state of one stream (a /ws connection or a WebRTC track).
+
+    Each stream needs its own: templates from another client's frames would reset it
+    every frame or match into the wrong picture.
+    """
+
+    def __init__(self):
+        self.faces: list = []
+        self.templates: list = []
+        self.age = 0
+
+    def start(self, frame: np.ndarray, faces: list) -> None:
+        self.faces = []
+        self.templates = []
+        self.age = 0
+        if not faces or PARAMS.detection_interval <= 1:
+            return
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        templates = [_face_template(gray, face) for face in faces]
+        if any(template is None for template in templates):
+            return
+        self.faces = list(faces)
+        self.templates = templates
+
+    def track(self, frame: np.ndarray) -> Optional[list]:
+        """Follow the last detected faces into this frame, or None when a re-detect is due."""
+        faces = self.faces
+        if not faces or self.age + 1 >= PARAMS.detection_interval:
+            return None
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        h, w = gray.shape[:2]
+        moves = []
+        for template, (ox, oy) in self.templates:
+            th, tw = template.shape[:2]
+            sx1, sy1 = max(0, ox - tw // 2), max(0, oy - th // 2)
+            sx2, sy2 = min(w, ox + tw + tw // 2), min(h, oy + th + th // 2)
+            search = gray[sy1:sy2, sx1:sx2]
+            if search.shape[0] < th or search.shape[1] < tw:
+                return None
+            result = cv2.matchTemplate(search, template, cv2.TM_CCOEFF_NORMED)
+            _min_val, score, _min_loc, (mx, my) = cv2.minMaxLoc(result)
+            if score < TRACK_MIN_SCORE:
+                return None
+            moves.append((sx1 + mx - ox, sy1 + my - oy))
+
+        templates = []
+        for face, (dx, dy) in zip(faces, moves):
+            if dx or dy:
+                _shift_face(face, dx, dy)
+            template = _face_template(gray, face)
+            if template is None:
+                return None
+            templates.append(template)
+        self.templates = templates
+        self.age += 1
+        return faces
+
 
 class ConnectionManager:
     def __init__(self):
@@ -275,7 +752,7 @@ class ConnectionManager:
         except:
             self.disconnect(websocket)
 
-    async def send_personal_bytes(self, data: bytes, websocket: WebSocket):
+    async def send_personal_bytes(self, data: Union[bytes, memoryview], websocket: WebSocket):
         try:
             await websocket.send_bytes(data)
         except:
@@ -283,61 +760,275 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+
+class BroadcastHub:
+    """Fans one publisher's processed frames out to any number of viewers.
+
+    Each subscriber gets a one-slot queue, so a slow viewer only ever skips to the
+    newest frame instead of building a backlog or slowing down the others.
+    """
+
+    def __init__(self):
+        self.subscribers: set[asyncio.Queue] = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self.subscribers.discard(queue)
+
+    def publish(self, payload: Union[bytes, memoryview]) -> None:
+        for queue in self.subscribers:
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(payload)
+
+
+# Only channels with at least one viewer have a hub; publishers look theirs up per frame.
+broadcast_hubs: Dict[str, BroadcastHub] = {}
+
+
+def _subscribe_broadcast(channel: str) -> asyncio.Queue:
+    hub = broadcast_hubs.get(channel)
+    if hub is None:
+        hub = broadcast_hubs[channel] = BroadcastHub()
+    return hub.subscribe()
+
+
+def _unsubscribe_broadcast(channel: str, queue: asyncio.Queue) -> None:
+    """Drop a viewer's queue, and the channel's hub with its last viewer."""
+    hub = broadcast_hubs.get(channel)
+    if hub is None:
+        return
+    hub.unsubscribe(queue)
+    if not hub.subscribers:
+        del broadcast_hubs[channel]
+
 # Pydantic models for API
 class ProcessingParams(BaseModel):
     video_quality: Optional[int] = None
     frame_skip: Optional[int] = None
+    target_latency_ms: Optional[int] = None
     target_fps: Optional[int] = None
     enable_face_enhancer: Optional[bool] = None
     max_faces: Optional[int] = None
     processing_resolution: Optional[tuple] = None
+    detection_width: Optional[int] = None
+    detection_interval: Optional[int] = None
 
 def init_face_swapper():
     """Initialize the face swapper model"""
     global face_swapper
     try:
         # Import and initialize frame processors
-        for frame_processor in get_frame_processors_modules(modules.globals.frame_processors):
+        frame_processors = get_frame_processors_modules(modules.globals.frame_processors)
+        for frame_processor in frame_processors:
             if not frame_processor.pre_check():
                 raise Exception(f"Pre-check failed for {frame_processor.NAME}")
             # Skip pre_start for now since it requires source path
 
-        # Get face swapper module
-        face_swapper_module = get_frame_processors_modules(['face_swapper'])[0]
+        # Get face swapper module from the list just loaded instead of resolving it again
+        face_swapper_module = next(
+            (module for module in frame_processors if module.__name__.endswith('.face_swapper')), None
+        ) or load_frame_processor_module('face_swapper')
         face_swapper = face_swapper_module
+        _verify_face_swapper_providers(face_swapper_module)
         print("Face swapper initialized successfully")
         return True
     except Exception as e:
         print(f"Failed to initialize face swapper: {e}")
         return False
 
-def process_frame_with_face_swap(frame: Optional[np.ndarray]) -> Optional[np.ndarray]:
-    """Process a single frame with face swapping"""
+def _refresh_source_from_disk() -> None:
+    """Reload the source face if another worker uploaded a new one."""
+    global source_image_path, source_face_cache, _source_marker_mtime
+
+    try:
+        mtime = os.stat(SOURCE_MARKER_PATH).st_mtime_ns
+    except OSError:
+        return
+    if mtime == _source_marker_mtime:
+        return
+    _source_marker_mtime = mtime
+
+    try:
+        with open(SOURCE_MARKER_PATH, "r", encoding="utf-8") as marker:
+            path = marker.read().strip()
+        image = cv2.imread(path)
+        if image is None:
+            return
+        face = _detect_source_face(image)
+        if face:
+            source_image_path = path
+            source_face_cache = face
+            print(f"Source image reloaded from disk: {path}")
+    except Exception as e:
+        print(f"Failed to reload source image: {e}")
+
+def _verify_face_swapper_providers(face_swapper_module) -> None:
+    """Check that the swapper session actually bound to the requested provider."""
+    requested = _provider_name(modules.globals.execution_providers[0]) if modules.globals.execution_providers else None
+    session = getattr(face_swapper_module.get_face_swapper(), "session", None)
+    if session is None or not hasattr(session, "get_providers"):
+        return
+    bound = session.get_providers()
+    if requested and bound and bound[0] != requested:
+        print(f"⚠ WARNING: face swapper requested {requested} but is running on {bound[0]}")
+    else:
+        print(f"Face swapper session providers: {bound}")
+
+class IOBindingSession:
+    """Proxy an ORT session so run() reuses device-resident input buffers via IOBinding.
+
+    Inputs are copied into CUDA OrtValues that are allocated once per shape and
+    updated in place. Outputs are allocated on the device by the first run for a
+    given input signature and rebound on later runs, so only the final results are
+    copied back to the host.
+    """
+
+    def __init__(self, session, device_id: int = 0):
+        self._session = session
+        self._device_id = device_id
+        self._binding = session.io_binding()
+        self._inputs: Dict[str, Any] = {}
+        self._outputs: Dict[Any, list] = {}
+        self._output_names = [output.name for output in session.get_outputs()]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._session, name)
+
+    def run(self, output_names, input_feed, run_options=None):
+        import onnxruntime as ort  # type: ignore
+
+        binding = self._binding
+        signature = []
+        for name, array in input_feed.items():
+            array = np.ascontiguousarray(array)
+            key = (array.shape, array.dtype.str)
+            signature.append((name, key))
+            cached = self._inputs.get(name)
+            if cached is None or cached[0] != key:
+                value = ort.OrtValue.ortvalue_from_numpy(array, "cuda", self._device_id)
+                self._inputs[name] = (key, value)
+            else:
+                value = cached[1]
+                value.update_inplace(array)
+            binding.bind_ortvalue_input(name, value)
+
+        names = list(output_names or self._output_names)
+        signature = (tuple(signature), tuple(names))
+        cached_outputs = self._outputs.get(signature)
+        if cached_outputs is not None:
+            for name, value in zip(names, cached_outputs):
+                binding.bind_ortvalue_output(name, value)
+        else:
+            for name in names:
+                binding.bind_output(name, "cuda", self._device_id)
+
+        self._session.run_with_iobinding(binding, run_options)
+        if cached_outputs is None:
+            self._outputs[signature] = binding.get_outputs()
+        outputs = binding.copy_outputs_to_cpu()
+        binding.clear_binding_outputs()
+        return outputs
+
+
+io_binding_enabled = False
+CUDA_DEVICE_PROVIDERS = ("TensorrtExecutionProvider", "CUDAExecutionProvider")
+_io_bound_analyser = None
+
+
+def _bind_model_session(model: Any) -> None:
+    session = getattr(model, "session", None)
+    if session is None or isinstance(session, IOBindingSession):
+        return
+    if not hasattr(session, "io_binding") or session.get_providers()[0] not in CUDA_DEVICE_PROVIDERS:
+        return
+    model.session = IOBindingSession(session)
+
+
+def _bind_sessions_to_device() -> None:
+    """Wrap the analyser and swapper sessions with IOBinding (GPU mode only)."""
+    global _io_bound_analyser
+
+    analyser = modules.face_analyser.get_face_analyser()
+    if analyser is not _io_bound_analyser:
+        for model in getattr(analyser, "models", {}).values():
+            _bind_model_session(model)
+        _io_bound_analyser = analyser
+
+    _bind_model_session(face_swapper_processor.get_face_swapper())
+
+
+def _detect_target_faces(frame: np.ndarray) -> list:
+    """Run the detector (limited by max_faces) and return faces in full-frame coordinates."""
+    # Detect on a downscaled proxy (the detector's det_size is sized to
+    # match); the swap itself still runs on the full-resolution frame.
+    detect_frame = frame
+    detect_scale = 1.0
+    detection_width = PARAMS.detection_width
+    frame_height, frame_width = frame.shape[:2]
+    if detection_width and frame_width > detection_width:
+        detect_scale = frame_width / float(detection_width)
+        detect_height = max(1, int(round(frame_height / detect_scale)))
+        detect_frame = cv2.resize(
+            frame, (detection_width, detect_height), interpolation=cv2.INTER_AREA
+        )
+
+    max_faces = PARAMS.max_faces
+    if max_faces == 1:
+        target_face = get_one_face(detect_frame)
+        target_faces = [target_face] if target_face else []
+    else:
+        target_faces = get_many_faces(detect_frame) or []
+        if len(target_faces) > max_faces:
+            target_faces = target_faces[:max_faces]
+
+    if detect_scale != 1.0:
+        for target_face in target_faces:
+            _scale_face(target_face, detect_scale)
+    return target_faces
+
+
+def process_frame_with_face_swap(
+    frame: Optional[np.ndarray], tracker: Optional[FaceTracker] = None
+) -> Optional[np.ndarray]:
+    """Process a single frame with face swapping; without a tracker every frame is detected"""
     global face_swapper, source_face_cache
 
     if frame is None:
         return None
 
+    if shared_source_sync:
+        _refresh_source_from_disk()
+
     if not face_swapper or source_face_cache is None:
         return frame
 
     try:
         with processing_lock:
-            # Create a temporary copy for processing
-            temp_frame = frame.copy()
+            # The analyser is rebuilt when the detector size changes; rebind it.
+            if io_binding_enabled and modules.face_analyser.FACE_ANALYSER is not _io_bound_analyser:
+                _bind_sessions_to_device()
+
+            # No defensive copy unless the swapper is known to write into its input
+            temp_frame = frame.copy() if FRAME_SWAPPER_MUTATES_INPUT else frame
 
             source_face = source_face_cache
+            enhancer_on = PARAMS.enable_face_enhancer
 
             # Get target faces from current frame (limited by max_faces parameter)
             detect_start = time.perf_counter()
-            max_faces = processing_params["max_faces"]
-            if max_faces == 1:
-                target_face = get_one_face(temp_frame)
-                target_faces = [target_face] if target_face else []
-            else:
-                target_faces = get_many_faces(temp_frame)
-                if len(target_faces) > max_faces:
-                    target_faces = target_faces[:max_faces]
+            target_faces = tracker.track(temp_frame) if tracker is not None else None
+            if target_faces is None:
+                target_faces = _detect_target_faces(temp_frame)
+                if tracker is not None:
+                    tracker.start(temp_frame, target_faces)
 
             if profiling_enabled:
                 timings["detect"].add(_ms_since(detect_start))
@@ -345,32 +1036,23 @@ def process_frame_with_face_swap(frame: Optional[np.ndarray]) -> Optional[np.nda
             if not target_faces:
                 return frame
 
-            from modules.processors.frame.face_swapper import swap_face
-
-            # Process each face
+            # Swap all faces with one batched inference
             swap_start = time.perf_counter()
-            for target_face in target_faces:
-                swapped = swap_face(source_face, target_face, temp_frame)
-                if swapped is not None:
-                    temp_frame = swapped
+            swapped = swap_faces_batched(source_face, target_faces, temp_frame)
+            if swapped is not None:
+                temp_frame = swapped
             if profiling_enabled:
                 timings["swap"].add(_ms_since(swap_start))
 
-            # Apply face enhancement if enabled
-            if processing_params["enable_face_enhancer"]:
+            # Apply face enhancement if enabled (GFPGAN enhances every face in one pass)
+            if enhancer_on and enhance_face is not None:
                 try:
-                    from modules.processors.frame.face_enhancer import enhance_face
-
                     enhance_start = time.perf_counter()
-                    for target_face in target_faces:
-                        enhanced = enhance_face(target_face, temp_frame)
-                        if enhanced is not None:
-                            temp_frame = enhanced
+                    enhanced = enhance_face(temp_frame)
+                    if enhanced is not None:
+                        temp_frame = enhanced
                     if profiling_enabled:
                         timings["enhance"].add(_ms_since(enhance_start))
-                except ImportError:
-                    # Face enhancer not available, skip
-                    pass
                 except Exception as e:
                     print(f"Face enhancement error: {e}")
 
@@ -380,6 +1062,75 @@ def process_frame_with_face_swap(frame: Optional[np.ndarray]) -> Optional[np.nda
         return frame
 
 
+# Frames per swapper inference for /process-video (--video-batch-size).
+video_batch_size = 8
+
+
+def process_frames_batched(frames: list) -> list:
+    """Face-swap a batch of video frames, running the swapper once for all of their faces.
+
+    Detection stays per frame (insightface's detector takes one image at a time) and does
+    not touch the live path's tracking state.
+    """
+    if shared_source_sync:
+        _refresh_source_from_disk()
+
+    if not face_swapper or source_face_cache is None:
+        return frames
+
+    try:
+        with processing_lock:
+            if io_binding_enabled and modules.face_analyser.FACE_ANALYSER is not _io_bound_analyser:
+                _bind_sessions_to_device()
+
+            frames_faces = [
+                (frame.copy() if FRAME_SWAPPER_MUTATES_INPUT else frame, _detect_target_faces(frame))
+                for frame in frames
+            ]
+            results = swap_frames_batched(source_face_cache, frames_faces)
+
+            if PARAMS.enable_face_enhancer and enhance_face is not None:
+                for index, (_, target_faces) in enumerate(frames_faces):
+                    if not target_faces:
+                        continue
+                    try:
+                        enhanced = enhance_face(results[index])
+                        if enhanced is not None:
+                            results[index] = enhanced
+                    except Exception as e:
+                        print(f"Face enhancement error: {e}")
+            return results
+    except Exception as e:
+        print(f"Error processing frame batch: {e}")
+        return frames
+
+
+@functools.lru_cache(maxsize=1)
+def _opencv_has_gstreamer() -> bool:
+    for line in cv2.getBuildInformation().splitlines():
+        if "GStreamer" in line:
+            return "YES" in line
+    return False
+
+def _open_video_writer(output_path: str, fps: float, size: Tuple[int, int]) -> Optional[Any]:
+    """NVENC (through GStreamer) in GPU mode when OpenCV was built with it, else software mp4v."""
+    if config is not None and config.mode == "gpu" and _opencv_has_gstreamer():
+        pipeline = (
+            "appsrc ! videoconvert ! video/x-raw,format=I420 ! "
+            "nvh264enc preset=low-latency-hp ! h264parse ! mp4mux ! "
+            f"filesink location={output_path}"
+        )
+        writer = cv2.VideoWriter(pipeline, cv2.CAP_GSTREAMER, 0, fps, size)
+        if writer.isOpened():
+            return writer
+        writer.release()
+        print("⚠ NVENC GStreamer pipeline unavailable, falling back to mp4v")
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        return None
+    return writer
+
 def _process_video_file_cv2(input_path: str, output_path: str) -> None:
     cap = cv2.VideoCapture(input_path)
     if not cap.isOpened():
@@ -401,100 +1152,50 @@ def _process_video_file_cv2(input_path: str, output_path: str) -> None:
 
     os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
 
-    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-    writer = cv2.VideoWriter(output_path, fourcc, float(fps), (width, height))
-    if not writer.isOpened():
+    writer = _open_video_writer(output_path, float(fps), (width, height))
+    if writer is None:
         cap.release()
         raise RuntimeError("Failed to open output video writer")
 
     try:
-        target_width, _target_height = processing_params["processing_resolution"]
+        target_width, _target_height = PARAMS.processing_resolution
+        batch_size = max(1, video_batch_size)
+
+        end_of_video = False
+        while not end_of_video:
+            # Read up to batch_size frames; the tail batch is simply smaller.
+            batch = []
+            while len(batch) < batch_size:
+                ret, frame = cap.read()
+                if not ret or frame is None:
+                    end_of_video = True
+                    break
 
-        while True:
-            ret, frame = cap.read()
-            if not ret or frame is None:
+                # Match live path: optionally downscale for processing speed.
+                in_h, in_w = frame.shape[:2]
+                if in_w > int(target_width):
+                    scale = float(target_width) / float(in_w)
+                    new_w = int(target_width)
+                    new_h = max(1, int(in_h * scale))
+                    frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
+                batch.append(frame)
+            if not batch:
                 break
 
-            # Match live path: optionally downscale for processing speed.
-            in_h, in_w = frame.shape[:2]
-            proc_frame = frame
-            if in_w > int(target_width):
-                scale = float(target_width) / float(in_w)
-                new_w = int(target_width)
-                new_h = max(1, int(in_h * scale))
-                proc_frame = cv2.resize(frame, (new_w, new_h))
+            for proc_frame, processed in zip(batch, process_frames_batched(batch)):
+                # Be defensive: some model paths can return None on failure.
+                if processed is None:
+                    processed = proc_frame
 
-            processed = process_frame_with_face_swap(proc_frame)
+                # Write back at original dimensions to keep output consistent.
+                if processed.shape[1] != width or processed.shape[0] != height:
+                    processed = cv2.resize(processed, (width, height))
 
-            # Be defensive: some model paths can return None on failure.
-            if processed is None:
-                processed = frame
-
-            # Write back at original dimensions to keep output consistent.
-            if processed.shape[1] != width or processed.shape[0] != height:
-                processed = cv2.resize(processed, (width, height))
-
-            writer.write(processed)
+                writer.write(processed)
     finally:
         cap.release()
         writer.release()
 
-    try:
-        # Create a temporary copy for processing
-        temp_frame = frame.copy()
-
-        source_face = source_face_cache
-
-        # Get target faces from current frame (limited by max_faces parameter)
-        detect_start = time.perf_counter()
-        max_faces = processing_params["max_faces"]
-        if max_faces == 1:
-            target_face = get_one_face(temp_frame)
-            target_faces = [target_face] if target_face else []
-        else:
-            target_faces = get_many_faces(temp_frame)
-            if len(target_faces) > max_faces:
-                target_faces = target_faces[:max_faces]
-
-        if profiling_enabled:
-            timings["detect"].add(_ms_since(detect_start))
-
-        if not target_faces:
-            return frame
-
-        from modules.processors.frame.face_swapper import swap_face
-
-        # Process each face
-        swap_start = time.perf_counter()
-        for target_face in target_faces:
-            swapped = swap_face(source_face, target_face, temp_frame)
-            if swapped is not None:
-                temp_frame = swapped
-        if profiling_enabled:
-            timings["swap"].add(_ms_since(swap_start))
-
-        # Apply face enhancement if enabled
-        if processing_params["enable_face_enhancer"]:
-            try:
-                from modules.processors.frame.face_enhancer import enhance_face
-                enhance_start = time.perf_counter()
-                for target_face in target_faces:
-                    enhanced = enhance_face(target_face, temp_frame)
-                    if enhanced is not None:
-                        temp_frame = enhanced
-                if profiling_enabled:
-                    timings["enhance"].add(_ms_since(enhance_start))
-            except ImportError:
-                # Face enhancer not available, skip
-                pass
-            except Exception as e:
-                print(f"Face enhancement error: {e}")
-
-        return temp_frame
-    except Exception as e:
-        print(f"Error processing frame: {e}")
-        return frame
-
 @app.get("/")
 async def root():
     """Server status endpoint"""
@@ -521,7 +1222,7 @@ async def health_check():
 @app.post("/upload-source")
 async def upload_source_image(file: UploadFile = File(...)):
     """Upload source image for face swapping"""
-    global source_image_path, source_face_cache
+    global source_image_path, source_face_cache, _source_marker_mtime
 
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
@@ -531,35 +1232,59 @@ async def upload_source_image(file: UploadFile = File(...)):
         uploads_dir = "uploads"
         os.makedirs(uploads_dir, exist_ok=True)
 
-        source_image_path = os.path.join(uploads_dir, f"source_{file.filename}")
-
-        with open(source_image_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        image_path = os.path.join(uploads_dir, f"source_{file.filename}")
 
-        # Verify it's a valid image with a face
-        test_image = cv2.imread(source_image_path)
+        # Decode straight from the upload instead of writing it out and reading it back
+        content = await file.read()
+        test_image = await _run_in_pool(DECODE_POOL, cv2.imdecode, np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR)
         if test_image is None:
             raise HTTPException(status_code=400, detail="Invalid image file")
 
-        # Check if face is detected
-        face = get_one_face(test_image)
+        # Check if face is detected (on the inference thread, not the event loop)
+        face = await _run_in_pool(INFERENCE_POOL, _detect_source_face, test_image)
         if not face:
             raise HTTPException(status_code=400, detail="No face detected in source image")
 
         # Cache the source face so we don't re-run detection every frame.
+        source_image_path = image_path
         source_face_cache = face
 
+        save = asyncio.to_thread(_save_source_upload, image_path, content)
+        if shared_source_sync:
+            # Other workers load the file as soon as the marker moves, so it must be complete first
+            _source_marker_mtime = await save
+        else:
+            task = asyncio.create_task(save)
+            background_saves.add(task)
+            task.add_done_callback(background_saves.discard)
+
         print(f"Source image uploaded: {source_image_path}")
         return {"message": "Source image uploaded successfully", "filename": file.filename}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 
+# Keeps fire-and-forget upload saves referenced until they finish
+background_saves: set = set()
+
+
+def _save_source_upload(path: str, content: bytes) -> int:
+    """Write the source image, then publish it to other workers; returns the marker mtime."""
+    with open(path, "wb") as buffer:
+        buffer.write(content)
+    with open(SOURCE_MARKER_PATH, "w", encoding="utf-8") as marker:
+        marker.write(path)
+    return os.stat(SOURCE_MARKER_PATH).st_mtime_ns
+
+
 @app.post("/process-video")
 async def process_video(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload a video clip, process it using the current source face, and return the processed video."""
+    if shared_source_sync:
+        await asyncio.to_thread(_refresh_source_from_disk)
     if source_face_cache is None:
         raise HTTPException(status_code=400, detail="No source image loaded. Upload a source image first.")
 
@@ -618,29 +1343,55 @@ async def process_video(background_tasks: BackgroundTasks, file: UploadFile = Fi
 @app.post("/update-parameters")
 async def update_parameters(params: ProcessingParams):
     """Update processing parameters dynamically"""
-    global processing_params
+    global PARAMS
 
     # Update only provided parameters
+    changes: Dict[str, Any] = {}
     if params.video_quality is not None:
-        processing_params["video_quality"] = max(10, min(95, params.video_quality))
+        changes["video_quality"] = max(10, min(95, params.video_quality))
     if params.frame_skip is not None:
-        processing_params["frame_skip"] = max(1, min(10, params.frame_skip))
+        changes["frame_skip"] = max(1, min(10, params.frame_skip))
+    if params.target_latency_ms is not None:
+        changes["target_latency_ms"] = max(0, min(1000, params.target_latency_ms))
     if params.target_fps is not None:
-        processing_params["target_fps"] = max(5, min(60, params.target_fps))
+        changes["target_fps"] = max(5, min(60, params.target_fps))
     if params.enable_face_enhancer is not None:
-        processing_params["enable_face_enhancer"] = params.enable_face_enhancer
+        changes["enable_face_enhancer"] = params.enable_face_enhancer
     if params.max_faces is not None:
-        processing_params["max_faces"] = max(1, min(10, params.max_faces))
+        changes["max_faces"] = max(1, min(10, params.max_faces))
+    if params.detection_interval is not None:
+        changes["detection_interval"] = max(1, min(30, params.detection_interval))
+    if params.detection_width is not None:
+        detection_width = 0 if params.detection_width <= 0 else max(160, min(1280, params.detection_width))
+        # detection_width resizes the detector too, which pinning exists to prevent
+        if processing_resolution_pinned and detection_width != PARAMS.detection_width:
+            raise HTTPException(
+                status_code=400,
+                detail="detection_width can't change while --processing-resolution pins the detector size",
+            )
+        changes["detection_width"] = detection_width
     if params.processing_resolution is not None:
-        processing_params["processing_resolution"] = params.processing_resolution
-        _set_detector_size_from_resolution(params.processing_resolution)
-        # Reinitialize analyser to apply new det_size
-        modules.face_analyser.FACE_ANALYSER = None
+        if processing_resolution_pinned and tuple(params.processing_resolution) != tuple(PARAMS.processing_resolution):
+            raise HTTPException(
+                status_code=400,
+                detail=f"processing_resolution is pinned to {PARAMS.processing_resolution} by --processing-resolution",
+            )
+        if not processing_resolution_pinned:
+            changes["processing_resolution"] = _snap_resolution(params.processing_resolution)
+
+    # Swap in a new immutable snapshot; frames in flight keep the one they started with.
+    PARAMS = replace(PARAMS, **changes)
+
+    if params.processing_resolution is not None or params.detection_width is not None:
+        # Rebuilding the analyser costs seconds (and a cuDNN re-tune), so only do it
+        # when the detector size actually changes.
+        if _set_detector_size_from_resolution(PARAMS.processing_resolution):
+            modules.face_analyser.FACE_ANALYSER = None
 
     return {
         "status": "success",
         "message": "Parameters updated successfully",
-        "current_params": processing_params
+        "current_params": asdict(PARAMS)
     }
 
 @app.get("/get-parameters")
@@ -648,7 +1399,7 @@ async def get_parameters():
     """Get current processing parameters"""
     return {
         "status": "success",
-        "params": processing_params
+        "params": asdict(PARAMS)
     }
 
 @app.websocket("/ws")
@@ -656,18 +1407,40 @@ async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time video processing"""
     await manager.connect(websocket)
 
+    # "jpeg" (default, browser webcams), "raw" (header + BGR payload, no codec work)
+    # or "yuv420" (JPEG in, header + I420 planes out)
+    wire_format = websocket.query_params.get("format", default_wire_format).lower()
+    # Publishing to a channel lets /ws/watch viewers share this client's inference.
+    channel = websocket.query_params.get("channel")
+    # Face tracking state of this connection only
+    tracker = FaceTracker()
+
     stop_event = asyncio.Event()
-    incoming_frames: asyncio.Queue[bytes] = asyncio.Queue(maxsize=1)
+    # Two-stage pipeline: decoder() turns the newest received bytes into a frame while
+    # inferencer() is still busy with the previous one. Both queues drop their oldest entry.
+    incoming_frames: asyncio.Queue[bytes] = asyncio.Queue(maxsize=2)
+    decoded_frames: asyncio.Queue[tuple] = asyncio.Queue(maxsize=1)
+    # Replies go through writer() so a slow socket doesn't hold up the next inference.
+    send_queue: asyncio.Queue[tuple] = asyncio.Queue(maxsize=2)
+    # Preallocated resize targets passed between the stages. A buffer is busy while its
+    # frame waits in decoded_frames, is being processed, or backs last_processed_frame.
+    free_resize_bufs: list = []
+
+    def release_resize_buf(buf: Optional[np.ndarray]) -> None:
+        if buf is not None:
+            free_resize_bufs.append(buf)
 
     async def receiver() -> None:
         try:
             while True:
                 data = await websocket.receive_bytes()
-                perf_counters["frames_received"] += 1
-                # Keep only the latest frame to avoid unbounded buffering.
+                _COUNTERS[CNT_FRAMES_RECEIVED] += 1
+                # Keep only the latest frames to avoid unbounded buffering; stale
+                # bytes are dropped before anyone pays to decode them.
                 if incoming_frames.full():
                     try:
                         incoming_frames.get_nowait()
+                        _COUNTERS[CNT_FRAMES_DROPPED_TOTAL] += 1
                     except asyncio.QueueEmpty:
                         pass
                 await incoming_frames.put(data)
@@ -677,102 +1450,213 @@ async def websocket_endpoint(websocket: WebSocket):
             stop_event.set()
             raise
 
-    async def processor() -> None:
-        frame_skip_counter = 0
-        last_processed_frame = None
-        last_send_time = 0.0
+    async def decoder() -> None:
+        # Read once per connection; --profile can't change while the server runs.
+        profile = profiling_enabled
 
         while not stop_event.is_set():
-            loop_start = time.perf_counter()
             try:
                 wait_start = time.perf_counter()
                 data = await asyncio.wait_for(incoming_frames.get(), timeout=1.0)
-                if profiling_enabled:
+                if profile:
                     timings["ws_wait"].add(_ms_since(wait_start))
             except asyncio.TimeoutError:
                 continue
+            loop_start = time.perf_counter()
 
-            # Drain queue to process the most recent frame.
+            # Drain queue to decode the most recent frame only.
             while not incoming_frames.empty():
                 try:
                     data = incoming_frames.get_nowait()
                 except asyncio.QueueEmpty:
                     break
+                _COUNTERS[CNT_FRAMES_DROPPED_TOTAL] += 1
 
-            img_array = np.frombuffer(data, np.uint8)
             decode_start = time.perf_counter()
-            frame = await asyncio.to_thread(cv2.imdecode, img_array, cv2.IMREAD_COLOR)
-            if profiling_enabled:
+            pts, compress_reply = 0, False
+            if wire_format == "raw":
+                raw = _decode_raw_frame(data)
+                frame, pts, compress_reply = raw if raw is not None else (None, 0, False)
+            else:
+                frame = await _run_in_pool(DECODE_POOL, _decode_jpeg, data)
+            if profile:
                 timings["decode"].add(_ms_since(decode_start))
             if frame is None:
-                perf_counters["frames_decode_failed"] += 1
+                _COUNTERS[CNT_FRAMES_DECODE_FAILED] += 1
                 continue
-            perf_counters["frames_decoded"] += 1
+            _COUNTERS[CNT_FRAMES_DECODED] += 1
 
             # Use dynamic processing resolution
-            target_width, _target_height = processing_params["processing_resolution"]
+            target_width, _target_height = PARAMS.processing_resolution
             height, width = frame.shape[:2]
+            resize_buf = None
             if width > target_width:
                 scale = target_width / width
                 new_width = target_width
                 new_height = max(1, int(height * scale))
+                resize_buf = free_resize_bufs.pop() if free_resize_bufs else None
+                if resize_buf is None or resize_buf.shape != (new_height, new_width, 3):
+                    resize_buf = np.empty((new_height, new_width, 3), np.uint8)
                 resize_start = time.perf_counter()
-                frame = await asyncio.to_thread(cv2.resize, frame, (new_width, new_height))
-                if profiling_enabled:
+                frame = await _run_in_pool(
+                    DECODE_POOL, cv2.resize, frame, (new_width, new_height), dst=resize_buf, interpolation=cv2.INTER_AREA
+                )
+                if profile:
                     timings["resize"].add(_ms_since(resize_start))
 
+            if decoded_frames.full():
+                try:
+                    stale = decoded_frames.get_nowait()
+                    release_resize_buf(stale[3])
+                    _COUNTERS[CNT_FRAMES_DROPPED_TOTAL] += 1
+                except asyncio.QueueEmpty:
+                    pass
+            decoded_frames.put_nowait((frame, pts, compress_reply, resize_buf, loop_start))
+
+    async def inferencer() -> None:
+        profile = profiling_enabled
+        frame_skip_counter = 0
+        last_processed_frame = None
+        held_resize_buf = None
+        next_send_deadline = 0.0
+        # The last JPEG reply and the frame/quality it encoded, so a repeat skips the encode
+        last_payload = last_encoded_frame = last_encoded_quality = None
+        ewma_inference_ms = None
+        reuse_cache = FrameReuseCache(reuse_threshold) if reuse_threshold > 0 else None
+
+        while not stop_event.is_set():
+            try:
+                frame, pts, compress_reply, resize_buf, loop_start = await asyncio.wait_for(
+                    decoded_frames.get(), timeout=1.0
+                )
+            except asyncio.TimeoutError:
+                continue
+            p = PARAMS  # one consistent parameter snapshot per frame
+
             frame_skip_counter += 1
-            frame_skip = processing_params["frame_skip"]
-            if frame_skip_counter >= frame_skip:
+            frame_skip = p.frame_skip
+            target_latency_ms = p.target_latency_ms
+            if target_latency_ms and ewma_inference_ms is not None:
+                # Closed loop: skip enough frames to keep inference within the latency budget.
+                frame_skip = max(1, min(10, int(ewma_inference_ms / target_latency_ms)))
+            frame_hash = cached_frame = None
+            if frame_skip_counter >= frame_skip and reuse_cache is not None:
+                frame_hash = _phash(frame)
+                cached_frame = reuse_cache.lookup(
+                    frame_hash, source_face_cache, p.enable_face_enhancer
+                )
+            fresh = False
+            if cached_frame is not None:
+                frame_skip_counter = 0
+                processed_frame = last_processed_frame = cached_frame
+                done_buf = resize_buf
+                _COUNTERS[CNT_FRAMES_REUSED] += 1
+            elif frame_skip_counter >= frame_skip:
                 frame_skip_counter = 0
                 process_start = time.perf_counter()
-                processed_frame = await asyncio.to_thread(process_frame_with_face_swap, frame)
+                async with inference_semaphore:
+                    processed_frame = await _run_in_pool(
+                        INFERENCE_POOL, process_frame_with_face_swap, frame, tracker
+                    )
                 if processed_frame is None:
                     processed_frame = frame
-                if profiling_enabled:
-                    timings["process_total"].add(_ms_since(process_start))
+                fresh = True
+                last_encoded_frame = None
+                process_ms = _ms_since(process_start)
+                if ewma_inference_ms is None:
+                    ewma_inference_ms = process_ms
+                else:
+                    ewma_inference_ms = 0.9 * ewma_inference_ms + 0.1 * process_ms
+                if profile:
+                    timings["process_total"].add(process_ms)
                 last_processed_frame = processed_frame
-                perf_counters["frames_processed"] += 1
+                # This frame's buffer now backs last_processed_frame; the old one is free.
+                done_buf, held_resize_buf = held_resize_buf, resize_buf
+                if frame_hash is not None:
+                    # Cache entries must not alias a recycled resize buffer.
+                    reuse_cache.insert(frame_hash, processed_frame.copy() if processed_frame is frame else processed_frame)
+                _COUNTERS[CNT_FRAMES_PROCESSED] += 1
             else:
                 processed_frame = last_processed_frame if last_processed_frame is not None else frame
-                perf_counters["frames_skipped"] += 1
-
-            # Throttle *sending* to target_fps (don’t busy-loop and don’t drop responses).
-            target_fps = processing_params["target_fps"]
-            frame_interval = 1.0 / max(1, target_fps)
-            now = time.time()
-            sleep_for = (last_send_time + frame_interval) - now
-            if sleep_for > 0:
-                await asyncio.sleep(sleep_for)
-            last_send_time = time.time()
-
-            video_quality = processing_params["video_quality"]
+                done_buf = resize_buf
+                _COUNTERS[CNT_FRAMES_SKIPPED] += 1
+
+            # Pace *sending* to target_fps with a monotonic deadline: a late frame resets the
+            # deadline to now instead of building up a burst, so drift stays bounded.
+            now = time.monotonic()
+            next_send_deadline = max(now, next_send_deadline + 1.0 / max(1, p.target_fps))
+            if next_send_deadline > now:
+                await asyncio.sleep(next_send_deadline - now)
+
             encode_start = time.perf_counter()
-            ok, buffer = await asyncio.to_thread(
-                cv2.imencode,
-                '.jpg',
-                processed_frame,
-                [cv2.IMWRITE_JPEG_QUALITY, video_quality],
+            # A skipped or reused frame that is exactly the last reply: clients expect one
+            # reply per input, so the bytes are resent, but nothing is re-encoded. (Freshly
+            # processed frames never match; their buffer may be a recycled object.)
+            replay = (
+                wire_format == "jpeg"
+                and not fresh
+                and processed_frame is last_encoded_frame
+                and p.video_quality == last_encoded_quality
             )
-            if profiling_enabled:
-                timings["encode"].add(_ms_since(encode_start))
-            if not ok:
+            if replay:
+                payload = last_payload
+            elif wire_format == "raw":
+                if compress_reply:
+                    payload = await _run_in_pool(ENCODE_POOL, _encode_raw_frame, processed_frame, pts, True)
+                else:
+                    payload = _encode_raw_frame(processed_frame, pts, False)
+            elif wire_format == "yuv420":
+                payload = await _run_in_pool(ENCODE_POOL, _encode_i420_frame, processed_frame, pts)
+            else:
+                video_quality = p.video_quality
+                payload = await _run_in_pool(ENCODE_POOL, _encode_jpeg, processed_frame, video_quality)
+                # Only frames that outlive this iteration (last_processed_frame) can repeat.
+                if payload is not None and processed_frame is last_processed_frame:
+                    last_payload = payload
+                    last_encoded_frame = processed_frame
+                    last_encoded_quality = video_quality
+            # The payload no longer references the frame, so its resize buffer can be reused.
+            release_resize_buf(done_buf)
+            if payload is None:
                 continue
+            if not replay:
+                if profile:
+                    timings["encode"].add(_ms_since(encode_start))
+                _COUNTERS[CNT_FRAMES_ENCODED] += 1
+
+            # Same policy as ingress: a backed-up socket loses its oldest reply.
+            if send_queue.full():
+                try:
+                    send_queue.get_nowait()
+                    _COUNTERS[CNT_FRAMES_DROPPED_TOTAL] += 1
+                except asyncio.QueueEmpty:
+                    pass
+            send_queue.put_nowait((payload, loop_start))
+            hub = broadcast_hubs.get(channel) if channel else None
+            if hub is not None:
+                hub.publish(payload)
 
-            perf_counters["frames_encoded"] += 1
+    async def writer() -> None:
+        profile = profiling_enabled
 
+        while True:
+            payload, loop_start = await send_queue.get()
             send_start = time.perf_counter()
-            await manager.send_personal_bytes(buffer.tobytes(), websocket)
-            if profiling_enabled:
+            await websocket.send_bytes(payload)
+            if profile:
                 timings["send"].add(_ms_since(send_start))
                 timings["loop_total"].add(_ms_since(loop_start))
-            perf_counters["frames_sent"] += 1
+            _COUNTERS[CNT_FRAMES_SENT] += 1
 
-    recv_task = asyncio.create_task(receiver())
-    proc_task = asyncio.create_task(processor())
+    tasks = {
+        asyncio.create_task(receiver()),
+        asyncio.create_task(decoder()),
+        asyncio.create_task(inferencer()),
+        asyncio.create_task(writer()),
+    }
 
     try:
-        done, pending = await asyncio.wait({recv_task, proc_task}, return_when=asyncio.FIRST_COMPLETED)
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
         for task in pending:
             task.cancel()
         for task in done:
@@ -786,6 +1670,118 @@ async def websocket_endpoint(websocket: WebSocket):
     finally:
         manager.disconnect(websocket)
 
+@app.websocket("/ws/watch")
+async def watch_endpoint(websocket: WebSocket):
+    """View-only WebSocket: receives the frames published on /ws?channel=<name> without running inference"""
+    await manager.connect(websocket)
+    channel = websocket.query_params.get("channel", "default")
+    queue = _subscribe_broadcast(channel)
+
+    async def sender() -> None:
+        while True:
+            payload = await queue.get()
+            await websocket.send_bytes(payload)
+
+    async def disconnect_watcher() -> None:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    tasks = {asyncio.create_task(sender()), asyncio.create_task(disconnect_watcher())}
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            exc = task.exception()
+            if exc is not None:
+                raise exc
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WebSocket viewer error: {e}")
+    finally:
+        _unsubscribe_broadcast(channel, queue)
+        manager.disconnect(websocket)
+
+def _process_rtc_frame(image: np.ndarray, tracker: FaceTracker) -> np.ndarray:
+    target_width, _target_height = PARAMS.processing_resolution
+    height, width = image.shape[:2]
+    if width > target_width:
+        new_height = max(1, int(height * target_width / width))
+        image = cv2.resize(image, (target_width, new_height), interpolation=cv2.INTER_AREA)
+    processed = process_frame_with_face_swap(image, tracker)
+    return image if processed is None else processed
+
+
+if RTCPeerConnection is not None:
+    media_relay = MediaRelay()
+    peer_connections: set = set()
+
+    class FaceSwapTrack(MediaStreamTrack):
+        """Outbound video track that face-swaps each frame of the client's camera track."""
+
+        kind = "video"
+
+        def __init__(self, track):
+            super().__init__()
+            self.track = track
+            self.tracker = FaceTracker()
+
+        async def recv(self):
+            frame = await self.track.recv()
+            image = frame.to_ndarray(format="bgr24")
+            _COUNTERS[CNT_FRAMES_RECEIVED] += 1
+            async with inference_semaphore:
+                processed = await _run_in_pool(INFERENCE_POOL, _process_rtc_frame, image, self.tracker)
+            _COUNTERS[CNT_FRAMES_PROCESSED] += 1
+            new_frame = VideoFrame.from_ndarray(processed, format="bgr24")
+            new_frame.pts = frame.pts
+            new_frame.time_base = frame.time_base
+            return new_frame
+
+
+class RTCOffer(BaseModel):
+    sdp: str
+    type: str
+
+
+@app.post("/offer")
+async def webrtc_offer(offer: RTCOffer):
+    """WebRTC signalling: answer an SDP offer and stream back the face-swapped camera track."""
+    if RTCPeerConnection is None:
+        raise HTTPException(status_code=503, detail="WebRTC unavailable: install aiortc")
+
+    pc = RTCPeerConnection()
+    peer_connections.add(pc)
+
+    @pc.on("connectionstatechange")
+    async def on_connectionstatechange():
+        if pc.connectionState in ("failed", "closed"):
+            await pc.close()
+            peer_connections.discard(pc)
+
+    @pc.on("track")
+    def on_track(track):
+        if track.kind == "video":
+            # Unbuffered relay: a slow consumer gets the newest frame, never a backlog.
+            pc.addTrack(FaceSwapTrack(media_relay.subscribe(track, buffered=False)))
+
+    await pc.setRemoteDescription(RTCSessionDescription(sdp=offer.sdp, type=offer.type))
+    answer = await pc.createAnswer()
+    await pc.setLocalDescription(answer)
+    return {"sdp": pc.localDescription.sdp, "type": pc.localDescription.type}
+
+
+@app.on_event("shutdown")
+async def close_peer_connections() -> None:
+    if RTCPeerConnection is None:
+        return
+    await asyncio.gather(*(pc.close() for pc in list(peer_connections)))
+    peer_connections.clear()
+
+
 @app.get("/status")
 async def get_detailed_status():
     """Get detailed server status"""
@@ -802,11 +1798,13 @@ async def get_detailed_status():
         },
         "connections": {
             "active_clients": len(connected_clients),
-            "total_connections": len(manager.active_connections)
+            "total_connections": len(manager.active_connections),
+            "broadcast_viewers": {name: len(hub.subscribers) for name, hub in broadcast_hubs.items()},
         },
+        "frames_dropped_total": _COUNTERS[CNT_FRAMES_DROPPED_TOTAL],
         "profiling": {
             "enabled": profiling_enabled,
-            "counters": perf_counters,
+            "counters": _counters_snapshot(),
             "timings_ms": {name: stat.summary() for name, stat in timings.items()},
         },
         "runtime": {
@@ -847,28 +1845,174 @@ def parse_args():
         action="store_true",
         help="Enable lightweight per-stage profiling in /status"
     )
+    parser.add_argument(
+        "--video-batch-size",
+        type=int,
+        default=8,
+        help="Video frames whose faces are swapped in one inference on /process-video; "
+             "lower it if the GPU runs out of memory (default: 8)"
+    )
+    parser.add_argument(
+        "--reuse-threshold",
+        type=int,
+        default=0,
+        help="Re-send a cached result when a frame's 64-bit perceptual hash is within this "
+             "Hamming distance of a recently processed frame; 0 disables (default: 0)"
+    )
+    parser.add_argument(
+        "--max-concurrent-inference",
+        type=int,
+        default=1,
+        help="Maximum number of frames inferred concurrently across clients (default: 1)"
+    )
+    parser.add_argument(
+        "--jpeg-codec",
+        choices=["auto", "opencv", "turbojpeg", "nvimgcodec"],
+        default="auto",
+        help="JPEG codec for /ws frames; auto uses nvJPEG in GPU mode when available (default: auto)"
+    )
+    parser.add_argument(
+        "--disable-io-binding",
+        action="store_true",
+        help="Use plain session.run instead of IOBinding with reusable CUDA buffers in GPU mode"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes, each with its own ONNX Runtime sessions (default: 1)"
+    )
+    parser.add_argument(
+        "--wire-format",
+        choices=["jpeg", "yuv420"],
+        default="jpeg",
+        help="Reply format for /ws clients that don't pass ?format=; yuv420 skips JPEG encoding "
+             "and sends header + I420 planes (default: jpeg)"
+    )
+    parser.add_argument(
+        "--processing-resolution",
+        type=_parse_resolution,
+        default=None,
+        metavar="WxH",
+        help="Pin the processing resolution (and detector size) for the server's lifetime; "
+             "/update-parameters can then no longer change it or detection_width (default: not pinned, 640x480)"
+    )
+    parser.add_argument(
+        "--precision",
+        choices=["fp32", "fp16", "int8"],
+        default="fp32",
+        help="Face swapper model precision; int8 is created with quantize_swapper.py or --quantize, "
+             "and falls back to fp32 when it is missing (default: fp32)"
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Use the int8 face swapper, creating it at startup if missing (static quantization "
+             "calibrated on the faces in uploads/, dynamic when there are none); implies --precision int8"
+    )
+    parser.add_argument(
+        "--disable-tensorrt",
+        action="store_true",
+        help="Don't prefer TensorrtExecutionProvider in GPU mode even when it is available"
+    )
+    parser.add_argument(
+        "--intra-op-threads",
+        type=int,
+        default=0,
+        help="ONNX Runtime threads used inside a single operator; 0 lets ORT decide (default: 0)"
+    )
+    parser.add_argument(
+        "--inter-op-threads",
+        type=int,
+        default=0,
+        help="ONNX Runtime threads used to run independent operators; 0 lets ORT decide (default: 0)"
+    )
     return parser.parse_args()
 
-if __name__ == "__main__":
-    args = parse_args()
+def _build_session_options(intra_op_threads: int, inter_op_threads: int) -> Any:
+    """SessionOptions shared by the analyser and swapper sessions."""
+    import onnxruntime as ort
 
-    profiling_enabled = bool(args.profile)
+    sess_opts = ort.SessionOptions()
+    sess_opts.intra_op_num_threads = max(0, intra_op_threads)
+    sess_opts.inter_op_num_threads = max(0, inter_op_threads)
+    sess_opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return sess_opts
 
-    print("=" * 60)
-    print("🚀 Deep-Live-Cam Cloud Server")
-    print("=" * 60)
-    print(f"Mode: {args.mode.upper()}")
-    print(f"Host: {args.host}")
-    print(f"Port: {args.port}")
-    print("=" * 60)
+def _inference_cores() -> Optional[set]:
+    """Cores for the inference threads: all but the first, which is left to the event loop."""
+    if not hasattr(os, "sched_setaffinity"):
+        return None
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) < 4:
+        return None
+    return set(cores[1:])
+
+def _pin_current_thread(cores: Optional[set]) -> None:
+    """ThreadPoolExecutor initializer; on Linux pid 0 means the calling thread."""
+    if not cores:
+        return
+    try:
+        os.sched_setaffinity(0, cores)
+    except OSError as e:
+        print(f"⚠ Could not pin inference thread: {e}")
+
+def configure_server(args: argparse.Namespace) -> None:
+    """Apply CLI settings and load models (in the main process or in each worker)."""
+    global config, profiling_enabled, inference_semaphore, jpeg_backend, io_binding_enabled
+    global processing_resolution_pinned, INFERENCE_POOL, default_wire_format, reuse_threshold, PARAMS
+    global video_batch_size
+
+    profiling_enabled = bool(args.profile)
+    inference_semaphore = asyncio.Semaphore(max(1, args.max_concurrent_inference))
 
     # Initialize configuration
-    config = ServerConfig(mode=args.mode)
+    config = ServerConfig(
+        mode=args.mode, use_tensorrt=not args.disable_tensorrt, trt_fp16=args.precision == "fp16"
+    )
+    modules.globals.swapper_precision = args.precision
+    cpu_count = os.cpu_count() or 1
+    intra_op_threads, inter_op_threads = args.intra_op_threads, args.inter_op_threads
+    if config.mode == "cpu":
+        # Let one Run() use every core rather than splitting them across graph branches.
+        intra_op_threads = intra_op_threads or cpu_count
+        inter_op_threads = inter_op_threads or 1
+    modules.globals.session_options = _build_session_options(intra_op_threads, inter_op_threads)
+    # OpenCV's own pool otherwise grabs every core for imdecode/resize and fights ORT for them.
+    cv2.setNumThreads(2 if config.mode == "gpu" else cpu_count)
+    # One inference thread on the GPU keeps frames on a single CUDA stream.
+    inference_workers = 1 if config.mode == "gpu" else cpu_count
+    inference_cores = _inference_cores()
+    INFERENCE_POOL = ThreadPoolExecutor(
+        max_workers=inference_workers,
+        thread_name_prefix="inference",
+        initializer=_pin_current_thread,
+        initargs=(inference_cores,),
+    )
+
+    if args.processing_resolution is not None:
+        PARAMS = replace(PARAMS, processing_resolution=tuple(args.processing_resolution))
+        processing_resolution_pinned = True
+        print(f"Processing resolution pinned to {args.processing_resolution[0]}x{args.processing_resolution[1]}")
 
     # Initialize face detector size from default processing resolution
-    _set_detector_size_from_resolution(processing_params.get("processing_resolution"))
+    _set_detector_size_from_resolution(PARAMS.processing_resolution)
 
     print(f"Execution providers: {modules.globals.execution_providers}")
+    print(f"Face swapper precision: {args.precision}")
+    print(f"ORT threads: intra-op={intra_op_threads or 'auto'}, inter-op={inter_op_threads or 'auto'}")
+    print(f"OpenCV threads: {cv2.getNumThreads()}")
+    if inference_cores:
+        print(f"Inference threads pinned to cores {sorted(inference_cores)}")
+    jpeg_backend = _select_jpeg_backend(args.jpeg_codec, config.mode)
+    print(f"JPEG codec: {jpeg_backend}")
+    default_wire_format = args.wire_format
+    reuse_threshold = max(0, min(64, args.reuse_threshold))
+    video_batch_size = max(1, args.video_batch_size)
+    if reuse_threshold:
+        print(f"Near-duplicate frame reuse: Hamming distance <= {reuse_threshold}")
+    print(f"Default /ws wire format: {default_wire_format}")
     if profiling_enabled:
         print("Profiling: ENABLED (see /status)")
     else:
@@ -877,27 +2021,145 @@ if __name__ == "__main__":
     # Initialize face swapper
     if init_face_swapper():
         print("✓ Face swapper initialized successfully")
+        if config.mode == "gpu" and not args.disable_io_binding:
+            try:
+                _bind_sessions_to_device()
+                io_binding_enabled = True
+                print("✓ ONNX Runtime IOBinding enabled for CUDA sessions")
+            except Exception as e:
+                print(f"⚠ IOBinding setup failed, using default session.run: {e}")
+        _warm_up_sessions()
     else:
         print("⚠ Face swapper initialization failed - continuing anyway")
 
+
+def _warm_session(session: Any) -> None:
+    """Run a session once on zero inputs (dynamic dims become 1)."""
+    feed = {}
+    for model_input in session.get_inputs():
+        shape = [dim if isinstance(dim, int) and dim > 0 else 1 for dim in model_input.shape]
+        feed[model_input.name] = np.zeros(shape, dtype=np.float32)
+    session.run(None, feed)
+
+
+def _warm_up_sessions() -> None:
+    """Pre-pay CUDA context setup and cuDNN algorithm selection before the first client frame."""
+    width, height = PARAMS.processing_resolution
+    dummy = np.random.randint(0, 255, (int(height), int(width), 3), dtype=np.uint8)
+    start = time.perf_counter()
+    try:
+        analyser = modules.face_analyser.get_face_analyser()
+        swapper = face_swapper_processor.get_face_swapper()
+        # Twice: the first call autotunes, the second runs at steady state.
+        for _ in range(2):
+            # A noise frame has no faces, so the detector is driven through the analyser
+            # and the per-face models and the swapper are run directly.
+            analyser.get(dummy)
+            for taskname, model in analyser.models.items():
+                if taskname != "detection":
+                    _warm_session(model.session)
+            _warm_session(swapper.session)
+        print(f"✓ Warm-up finished in {_ms_since(start):.0f} ms")
+    except Exception as e:
+        print(f"⚠ Warm-up failed (first frames will be slower): {e}")
+
+
+def _ensure_int8_swapper(create: bool = True) -> bool:
+    """Make sure the int8 face swapper exists; False means serve with fp32 instead.
+
+    A missing model is created only when `create` is set.
+    """
+    from modules.processors.frame import face_swapper as face_swapper_module
+
+    path = os.path.join(face_swapper_module.models_dir, face_swapper_module.SWAPPER_MODELS["int8"])
+    if os.path.exists(path):
+        return True
+    if not create:
+        print(f"⚠ int8 face swapper not found at {path} (create it with --quantize), using fp32")
+        return False
+    try:
+        face_swapper_module.pre_check()
+        start = time.perf_counter()
+        path = face_swapper_module.create_quantized_model("int8", calibration_dir="uploads")
+        print(f"✓ int8 face swapper ready: {path} ({_ms_since(start):.0f} ms)")
+        return True
+    except Exception as e:
+        print(f"⚠ int8 quantization failed, falling back to fp32: {e}")
+        return False
+
+
+@app.on_event("startup")
+async def configure_worker() -> None:
+    """In --workers mode each uvicorn worker imports this module fresh; load its own models."""
+    global shared_source_sync
+
+    worker_args = os.environ.get(WORKER_ARGS_ENV)
+    if config is not None or not worker_args:
+        return
+    shared_source_sync = True
+    await asyncio.to_thread(configure_server, argparse.Namespace(**json.loads(worker_args)))
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    print("=" * 60)
+    print("🚀 Deep-Live-Cam Cloud Server")
+    print("=" * 60)
+    print(f"Mode: {args.mode.upper()}")
+    print(f"Host: {args.host}")
+    print(f"Port: {args.port}")
+    print(f"Workers: {max(1, args.workers)}")
+    print(f"Max concurrent inference: {max(1, args.max_concurrent_inference)}")
+    print("=" * 60)
+
+    if args.quantize or args.precision == "int8":
+        # Done once here, before any worker starts, so workers never race on the model file
+        args.precision = "int8" if _ensure_int8_swapper(create=args.quantize) else "fp32"
+        # Never serve with models loaded before configure_server() set providers and sizes
+        modules.face_analyser.FACE_ANALYSER = None
+
+    # With multiple workers, models are loaded per worker at startup instead.
+    if args.workers <= 1:
+        configure_server(args)
+
     # Create uploads directory
     os.makedirs("uploads", exist_ok=True)
 
     print(f"\n🌐 Server starting at http://{args.host}:{args.port}")
     print("📡 WebSocket endpoint: /ws")
+    print("👀 Viewer endpoint: /ws/watch?channel=<name> (publish with /ws?channel=<name>)")
+    if RTCPeerConnection is not None:
+        print("🎥 WebRTC signalling endpoint: /offer")
     print("📤 Upload endpoint: /upload-source")
     print("❤️ Health check: /health")
     print("\nPress Ctrl+C to stop the server")
     print("=" * 60)
 
+    # Frames are already JPEG/raw/I420; permessage-deflate would only burn CPU on them.
     try:
-        uvicorn.run(
-            app,
-            host=args.host,
-            port=args.port,
-            log_level=args.log_level
-        )
+        if args.workers > 1:
+            # Each worker owns its ORT sessions; WebSocket clients must be pinned to one
+            # worker (sticky sessions) when a load balancer sits in front.
+            os.environ[WORKER_ARGS_ENV] = json.dumps(vars(args))
+            uvicorn.run(
+                "server:app",
+                app_dir=os.path.dirname(os.path.abspath(__file__)),
+                host=args.host,
+                port=args.port,
+                log_level=args.log_level,
+                workers=args.workers,
+                ws_per_message_deflate=False
+            )
+        else:
+            uvicorn.run(
+                app,
+                host=args.host,
+                port=args.port,
+                log_level=args.log_level,
+                ws_per_message_deflate=False
+            )
     except KeyboardInterrupt:
         print("\n👋 Server stopped by user")
     except Exception as e:
-        print(f"\n❌ Server error: {e}")
\ No newline at end of file
+        print(f"\n❌ Server error: {e}")
@@ -2,12 +2,13 @@ import os
 import shutil
 from typing import Any
 import insightface
+import onnxruntime
 
 import cv2
 import numpy as np
 import modules.globals
 from tqdm import tqdm
-from modules.typing import Frame
+from modules.typing import Face, Frame
 from modules.cluster_analysis import find_cluster_centroids, find_closest_centroid
 from modules.utilities import get_temp_directory_path, create_temp, extract_frames, clean_temp, get_temp_frame_paths
 from pathlib import Path
@@ -20,21 +21,46 @@ def get_face_analyser() -> Any:
 
     if FACE_ANALYSER is None:
         FACE_ANALYSER = insightface.app.FaceAnalysis(name='buffalo_l', providers=modules.globals.execution_providers)
+        if modules.globals.session_options is not None:
+            # insightface's model_zoo only forwards providers; rebuild the sessions with the SessionOptions
+            for model in FACE_ANALYSER.models.values():
+                model.session = onnxruntime.InferenceSession(model.model_file, sess_options=modules.globals.session_options, providers=modules.globals.execution_providers)
         FACE_ANALYSER.prepare(ctx_id=0, det_size=tuple(modules.globals.detector_size))
     return FACE_ANALYSER
 
 
-def get_one_face(frame: Frame) -> Any:
-    face = get_face_analyser().get(frame)
+def analyse_faces(frame: Frame, det_size: Any = None) -> Any:
+    """FaceAnalysis.get, optionally with a detector input size other than the prepared one.
+
+    The analyser is shared, so a different det_size is passed to this call's detection
+    instead of re-preparing it.
+    """
+    face_analyser = get_face_analyser()
+    if det_size is None or tuple(det_size) == tuple(face_analyser.det_model.input_size):
+        return face_analyser.get(frame)
+    bboxes, kpss = face_analyser.det_model.detect(frame, input_size=tuple(det_size), max_num=0, metric='default')
+    faces = []
+    for i in range(bboxes.shape[0]):
+        kps = kpss[i] if kpss is not None else None
+        face = Face(bbox=bboxes[i, 0:4], kps=kps, det_score=bboxes[i, 4])
+        for taskname, model in face_analyser.models.items():
+            if taskname != 'detection':
+                model.get(frame, face)
+        faces.append(face)
+    return faces
+
+
+def get_one_face(frame: Frame, det_size: Any = None) -> Any:
+    face = analyse_faces(frame, det_size)
     try:
         return min(face, key=lambda x: x.bbox[0])
     except ValueError:
         return None
 
 
-def get_many_faces(frame: Frame) -> Any:
+def get_many_faces(frame: Frame, det_size: Any = None) -> Any:
     try:
-        return get_face_analyser().get(frame)
+        return analyse_faces(frame, det_size)
     except IndexError:
         return None
 
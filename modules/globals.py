@@ -30,6 +30,7 @@ live_resizable = True
 max_memory = None
 execution_providers: List[str] = []
 execution_threads = None
+session_options = None  # onnxruntime.SessionOptions for model sessions, None = ORT defaults
 headless = None
 log_level = "error"
 fp_ui: Dict[str, bool] = {"face_enhancer": False}
@@ -37,6 +38,7 @@ camera_input_combobox = None
 webcam_preview_running = False
 show_fps = False
 detector_size = (640, 640)
+swapper_precision = "fp32"  # fp32 | fp16 | int8, see face_swapper.SWAPPER_MODELS
 mouth_mask = False
 show_mouth_mask_box = False
 mask_feather_ratio = 8
@@ -0,0 +1,56 @@
+"""Fused pre-processing kernels for the face swapper input (optional, needs Numba)."""
+import cv2
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+def available() -> bool:
+    return njit is not None
+
+
+if njit is not None:
+
+    @njit(parallel=True, cache=True, fastmath=True)
+    def _warp_to_blob(
+        src: np.ndarray, inv_m: np.ndarray, dst: np.ndarray, index: int, mean: float, scale: float
+    ) -> None:
+        height, width = src.shape[0], src.shape[1]
+        out_h, out_w = dst.shape[2], dst.shape[3]
+        for y in prange(out_h):
+            for x in range(out_w):
+                # Crop pixel -> source pixel, then bilinear sample (zero outside, like warpAffine)
+                sx = inv_m[0, 0] * x + inv_m[0, 1] * y + inv_m[0, 2]
+                sy = inv_m[1, 0] * x + inv_m[1, 1] * y + inv_m[1, 2]
+                x0 = int(np.floor(sx))
+                y0 = int(np.floor(sy))
+                fx = sx - x0
+                fy = sy - y0
+                for c in range(3):
+                    value = 0.0
+                    for dy in range(2):
+                        yy = y0 + dy
+                        if yy < 0 or yy >= height:
+                            continue
+                        wy = fy if dy else 1.0 - fy
+                        for dx in range(2):
+                            xx = x0 + dx
+                            if xx < 0 or xx >= width:
+                                continue
+                            wx = fx if dx else 1.0 - fx
+                            value += wy * wx * src[yy, xx, c]
+                    # BGR source -> RGB planes
+                    dst[index, 2 - c, y, x] = (value - mean) * scale
+
+
+def warp_to_blob(src_bgr: np.ndarray, M: np.ndarray, dst: np.ndarray, index: int, mean: float, std: float) -> None:
+    """Write the aligned crop of src_bgr into dst[index] as normalized RGB NCHW float32.
+
+    Equivalent to face_align.norm_crop2 followed by cv2.dnn.blobFromImages(swapRB=True),
+    but done in one pass over the output pixels without the intermediate uint8 crop.
+    """
+    inv_m = cv2.invertAffineTransform(M).astype(np.float64)
+    _warp_to_blob(np.ascontiguousarray(src_bgr), inv_m, dst, index, float(mean), 1.0 / float(std))
@@ -1,9 +1,13 @@
-from typing import Any, List
+from typing import Any, Dict, List, Optional, Tuple
 import cv2
 import insightface
+import onnxruntime
+from insightface.model_zoo.inswapper import INSwapper
+from insightface.utils import face_align
 import threading
 import numpy as np
 import modules.globals
+import modules.preproc as preproc
 import logging
 import modules.processors.frame.core
 from modules.core import update_status
@@ -20,27 +24,157 @@ import os
 FACE_SWAPPER = None
 THREAD_LOCK = threading.Lock()
 NAME = "DLC.FACE-SWAPPER"
+# swap_face/swap_faces_batched always return a new buffer and never write into the
+# frame they are given, so callers don't need a defensive copy. Flip this if that changes.
+FRAME_SWAPPER_MUTATES_INPUT = False
+_BLOB_BUFFERS = threading.local()
+# (source face, emap, latent) of the last batched swap
+_LATENT_CACHE = (None, None, None)
+# (swapper, whether its model takes batches larger than 1)
+_BATCHED_SWAP_CACHE = (None, False)
 
 abs_dir = os.path.dirname(os.path.abspath(__file__))
 models_dir = os.path.join(
     os.path.dirname(os.path.dirname(os.path.dirname(abs_dir))), "models"
 )
 
+MODEL_BASE_URL = "https://huggingface.co/hacksider/deep-live-cam/resolve/main/"
+SWAPPER_MODELS = {
+    "fp32": "inswapper_128.onnx",
+    "fp16": "inswapper_128_fp16.onnx",
+    # Not published upstream; produced locally by create_quantized_model("int8")
+    "int8": "inswapper_128_int8.onnx",
+}
+
 
 def pre_check() -> bool:
     download_directory_path = models_dir
-    model_url = "https://huggingface.co/hacksider/deep-live-cam/resolve/main/inswapper_128.onnx"
-    # Force FP32 model for now to fix GPU distortion issues
-    # if "CUDAExecutionProvider" in modules.globals.execution_providers:
-    #     model_url = "https://huggingface.co/hacksider/deep-live-cam/resolve/main/inswapper_128_fp16.onnx"
+    model_urls = [MODEL_BASE_URL + SWAPPER_MODELS["fp32"]]
+    # Force FP32 model by default to fix GPU distortion issues; fp16 is opt-in
+    if modules.globals.swapper_precision == "fp16":
+        model_urls.append(MODEL_BASE_URL + SWAPPER_MODELS["fp16"])
 
     conditional_download(
         download_directory_path,
-        [model_url],
+        model_urls,
     )
     return True
 
 
+def get_model_path(precision: str = None) -> str:
+    precision = precision or modules.globals.swapper_precision
+    model_path = os.path.join(models_dir, SWAPPER_MODELS.get(precision, SWAPPER_MODELS["fp32"]))
+    if not os.path.exists(model_path):
+        print(f"Face swapper {precision} model not found at {model_path}, using fp32.")
+        model_path = os.path.join(models_dir, SWAPPER_MODELS["fp32"])
+    return model_path
+
+
+def _calibration_feeds(calibration_dir: str, limit: int = 32) -> List[Dict[str, np.ndarray]]:
+    """Swapper input feeds (aligned crop + own latent) for the faces found in calibration_dir."""
+    model_path = os.path.join(models_dir, SWAPPER_MODELS["fp32"])
+    # INSwapper(session=None) builds a session without providers, which GPU builds of ORT reject
+    session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+    swapper = INSwapper(model_file=model_path, session=session)
+    # A CPU analyser of its own: the shared one is only built once the server has set the
+    # providers, SessionOptions and detector size it should run with
+    analyser = insightface.app.FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
+    analyser.prepare(ctx_id=0, det_size=(640, 640))
+    feeds = []
+    for name in sorted(os.listdir(calibration_dir)):
+        path = os.path.join(calibration_dir, name)
+        if not is_image(path):
+            continue
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        for face in analyser.get(image):
+            aimg, _ = face_align.norm_crop2(image, face.kps, swapper.input_size[0])
+            blob = cv2.dnn.blobFromImage(
+                aimg, 1.0 / swapper.input_std, swapper.input_size,
+                (swapper.input_mean, swapper.input_mean, swapper.input_mean), swapRB=True
+            )
+            latent = np.dot(face.normed_embedding.reshape((1, -1)), swapper.emap)
+            latent /= np.linalg.norm(latent)
+            feeds.append({swapper.input_names[0]: blob, swapper.input_names[1]: latent.astype(np.float32)})
+            if len(feeds) >= limit:
+                return feeds
+    return feeds
+
+
+def _append_emap(source_path: str, target_path: str) -> None:
+    """Copy the fp32 model's emap to the end of the quantized model's initializers.
+
+    INSwapper reads emap from the last initializer; the ORT quantizers drop it because
+    no node reads it, which would leave a quantization scale or zero-point there.
+    """
+    import onnx
+
+    emap = onnx.load(source_path).graph.initializer[-1]
+    model = onnx.load(target_path)
+    initializers = model.graph.initializer
+    for index in reversed(range(len(initializers))):
+        if initializers[index].name == emap.name:
+            del initializers[index]
+    initializers.append(emap)
+    onnx.save(model, target_path)
+
+
+def create_quantized_model(precision: str, calibration_dir: str = None) -> str:
+    """Convert the fp32 swapper to fp16 or int8 once and return its path.
+
+    int8 uses static quantization calibrated on the faces in calibration_dir when it
+    has any, and falls back to dynamic (weight-only) quantization otherwise.
+    """
+    source_path = os.path.join(models_dir, SWAPPER_MODELS["fp32"])
+    target_path = os.path.join(models_dir, SWAPPER_MODELS[precision])
+    if os.path.exists(target_path):
+        return target_path
+
+    if precision == "int8":
+        from onnxruntime.quantization import (
+            CalibrationDataReader,
+            QuantFormat,
+            QuantType,
+            quantize_dynamic,
+            quantize_static,
+        )
+
+        feeds = _calibration_feeds(calibration_dir) if calibration_dir and os.path.isdir(calibration_dir) else []
+        if feeds:
+
+            class FaceCalibrationReader(CalibrationDataReader):
+                def __init__(self) -> None:
+                    self._feeds = iter(feeds)
+
+                def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+                    return next(self._feeds, None)
+
+            print(f"Static int8 quantization calibrated on {len(feeds)} face(s) from {calibration_dir}")
+            quantize_static(
+                source_path,
+                target_path,
+                FaceCalibrationReader(),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+            )
+        else:
+            print("No calibration faces found, using dynamic int8 quantization")
+            quantize_dynamic(source_path, target_path, weight_type=QuantType.QInt8)
+        _append_emap(source_path, target_path)
+    elif precision == "fp16":
+        import onnx
+        from onnxconverter_common import float16
+
+        model = float16.convert_float_to_float16(onnx.load(source_path), keep_io_types=True)
+        onnx.save(model, target_path)
+    else:
+        return source_path
+    return target_path
+
+
 def pre_start() -> bool:
     if not modules.globals.map_faces and not is_image(modules.globals.source_path):
         update_status("Select an image for source path.", NAME)
@@ -63,14 +197,20 @@ def get_face_swapper() -> Any:
 
     with THREAD_LOCK:
         if FACE_SWAPPER is None:
-            model_name = "inswapper_128.onnx"
-            # Force FP32 model for now to fix GPU distortion issues
-            # if "CUDAExecutionProvider" in modules.globals.execution_providers:
-            #     model_name = "inswapper_128_fp16.onnx"
-            model_path = os.path.join(models_dir, model_name)
-            FACE_SWAPPER = insightface.model_zoo.get_model(
-                model_path, providers=modules.globals.execution_providers
-            )
+            model_path = get_model_path()
+            if modules.globals.session_options is not None:
+                # insightface's model_zoo only forwards providers, so build the
+                # session here to apply the SessionOptions.
+                session = onnxruntime.InferenceSession(
+                    model_path,
+                    sess_options=modules.globals.session_options,
+                    providers=modules.globals.execution_providers,
+                )
+                FACE_SWAPPER = INSwapper(model_file=model_path, session=session)
+            else:
+                FACE_SWAPPER = insightface.model_zoo.get_model(
+                    model_path, providers=modules.globals.execution_providers
+                )
     return FACE_SWAPPER
 
 
@@ -83,28 +223,190 @@ def swap_face(source_face: Face, target_face: Face, temp_frame: Frame) -> Frame:
     )
 
     if modules.globals.mouth_mask:
-        # Create a mask for the target face
-        face_mask = create_face_mask(target_face, temp_frame)
+        swapped_frame = apply_mouth_mask(swapped_frame, target_face, temp_frame)
 
-        # Create the mouth mask
-        mouth_mask, mouth_cutout, mouth_box, lower_lip_polygon = (
-            create_lower_mouth_mask(target_face, temp_frame)
-        )
+    return swapped_frame
 
-        # Apply the mouth area
-        swapped_frame = apply_mouth_area(
-            swapped_frame, mouth_cutout, mouth_box, face_mask, lower_lip_polygon
-        )
 
-        if modules.globals.show_mouth_mask_box:
-            mouth_mask_data = (mouth_mask, mouth_cutout, mouth_box, lower_lip_polygon)
-            swapped_frame = draw_mouth_mask_visualization(
-                swapped_frame, target_face, mouth_mask_data
-            )
+def apply_mouth_mask(swapped_frame: Frame, target_face: Face, temp_frame: Frame) -> Frame:
+    # Create a mask for the target face
+    face_mask = create_face_mask(target_face, temp_frame)
+
+    # Create the mouth mask
+    mouth_mask, mouth_cutout, mouth_box, lower_lip_polygon = (
+        create_lower_mouth_mask(target_face, temp_frame)
+    )
+
+    # Apply the mouth area
+    swapped_frame = apply_mouth_area(
+        swapped_frame, mouth_cutout, mouth_box, face_mask, lower_lip_polygon
+    )
+
+    if modules.globals.show_mouth_mask_box:
+        mouth_mask_data = (mouth_mask, mouth_cutout, mouth_box, lower_lip_polygon)
+        swapped_frame = draw_mouth_mask_visualization(
+            swapped_frame, target_face, mouth_mask_data
+        )
 
     return swapped_frame
 
 
+def supports_batched_swap() -> bool:
+    """True when the loaded swapper model accepts a batch dimension larger than 1."""
+    global _BATCHED_SWAP_CACHE
+
+    face_swapper = get_face_swapper()
+    swapper, batched = _BATCHED_SWAP_CACHE
+    if swapper is not face_swapper:
+        # Read from the session once per loaded swapper, not on every frame
+        batch_dim = face_swapper.session.get_inputs()[0].shape[0]
+        batched = not isinstance(batch_dim, int) or batch_dim != 1
+        _BATCHED_SWAP_CACHE = (face_swapper, batched)
+    return batched
+
+
+def swap_faces_batched(source_face: Face, target_faces: List[Face], temp_frame: Frame) -> Frame:
+    """Swap several faces with one swapper inference (one per face on fixed-batch models)."""
+    return swap_frames_batched(source_face, [(temp_frame, target_faces)])[0]
+
+
+def swap_frames_batched(source_face: Face, frames_faces: List[Tuple[Frame, List[Face]]]) -> List[Frame]:
+    """Swap the faces of several (frame, target_faces) pairs with one swapper inference."""
+    frames = [frame for frame, _ in frames_faces]
+    jobs = [(index, face) for index, (_, faces) in enumerate(frames_faces) for face in faces]
+    if not jobs:
+        return frames
+
+    face_swapper = get_face_swapper()
+    size = face_swapper.input_size[0]
+    mean = face_swapper.input_mean
+
+    # Align every target crop and stack them into one (N, 3, 128, 128) blob
+    matrices = []
+    if preproc.available():
+        # Fused warp + BGR->RGB + NCHW + normalize, written straight into a reused blob
+        blob = _batch_blob(len(jobs), size)
+        for job, (index, target_face) in enumerate(jobs):
+            M = face_align.estimate_norm(target_face.kps, size)
+            preproc.warp_to_blob(frames[index], M, blob, job, mean, face_swapper.input_std)
+            matrices.append(M)
+    else:
+        crops = []
+        for index, target_face in jobs:
+            aimg, M = face_align.norm_crop2(frames[index], target_face.kps, size)
+            crops.append(aimg)
+            matrices.append(M)
+        blob = cv2.dnn.blobFromImages(
+            crops, 1.0 / face_swapper.input_std, face_swapper.input_size, (mean, mean, mean), swapRB=True
+        )
+
+    latent = _source_latent(face_swapper, source_face)
+    if supports_batched_swap():
+        latents = np.repeat(latent, len(matrices), axis=0)
+        pred = face_swapper.session.run(
+            face_swapper.output_names,
+            {face_swapper.input_names[0]: blob, face_swapper.input_names[1]: latents},
+        )[0]
+    else:
+        # The stock inswapper_128.onnx has a fixed batch of 1: same pre/post-processing, one run per face
+        pred = np.concatenate([
+            face_swapper.session.run(
+                face_swapper.output_names,
+                {face_swapper.input_names[0]: blob[job:job + 1], face_swapper.input_names[1]: latent},
+            )[0]
+            for job in range(len(matrices))
+        ])
+    fakes = np.clip(255 * pred.transpose((0, 2, 3, 1)), 0, 255).astype(np.uint8)[:, :, :, ::-1]
+
+    # Each frame is copied once, then every face is blended into that copy in place
+    original_frames = list(frames)
+    copied = set()
+    for (index, target_face), M, bgr_fake in zip(jobs, matrices, fakes):
+        if index not in copied:
+            frames[index] = frames[index].copy()
+            copied.add(index)
+        paste_back_into(frames[index], bgr_fake, M)
+        if modules.globals.mouth_mask:
+            frames[index] = apply_mouth_mask(frames[index], target_face, original_frames[index])
+    return frames
+
+
+def _source_latent(face_swapper: Any, source_face: Face) -> np.ndarray:
+    """(1, 512) swapper latent for source_face, recomputed only when the face or model changes."""
+    global _LATENT_CACHE
+
+    face, emap, latent = _LATENT_CACHE
+    if face is not source_face or emap is not face_swapper.emap:
+        latent = source_face.normed_embedding.reshape((1, -1))
+        latent = np.dot(latent, face_swapper.emap)
+        latent /= np.linalg.norm(latent)
+        latent = latent.astype(np.float32)
+        # One tuple so concurrent readers never see a face paired with another face's latent
+        _LATENT_CACHE = (source_face, face_swapper.emap, latent)
+    return latent
+
+
+def _batch_blob(count: int, size: int) -> np.ndarray:
+    """Per-thread (N, 3, size, size) float32 input buffer, reallocated only when N changes."""
+    blob = getattr(_BLOB_BUFFERS, "blob", None)
+    if blob is None or blob.shape != (count, 3, size, size):
+        blob = _BLOB_BUFFERS.blob = np.empty((count, 3, size, size), dtype=np.float32)
+    return blob
+
+
+def paste_back(target_img: Frame, bgr_fake: np.ndarray, M: np.ndarray) -> Frame:
+    """Blend a swapped 128x128 crop back into a copy of the frame (same mask as INSwapper.get)."""
+    result = target_img.copy()
+    paste_back_into(result, bgr_fake, M)
+    return result
+
+
+def paste_back_into(frame: Frame, bgr_fake: np.ndarray, M: np.ndarray) -> None:
+    """paste_back() writing into `frame` in place, working only on the face's region.
+
+    The mask is zero outside the warped crop, so eroding, blurring and blending just
+    its bounding box (padded by the kernel sizes) gives the full-frame result.
+    """
+    IM = cv2.invertAffineTransform(M)
+    crop_h, crop_w = bgr_fake.shape[:2]
+    corners = np.array([[0, 0, 1], [crop_w, 0, 1], [0, crop_h, 1], [crop_w, crop_h, 1]], dtype=np.float64)
+    points = corners @ IM.T
+    (min_x, min_y), (max_x, max_y) = points.min(axis=0), points.max(axis=0)
+    extent = np.sqrt(max(max_x - min_x, 1.0) * max(max_y - min_y, 1.0))
+    pad = int(max(extent // 10, 10) + 2 * max(extent // 20, 5) + 2)
+    frame_h, frame_w = frame.shape[:2]
+    x0, y0 = max(int(np.floor(min_x)) - pad, 0), max(int(np.floor(min_y)) - pad, 0)
+    x1, y1 = min(int(np.ceil(max_x)) + pad, frame_w), min(int(np.ceil(max_y)) + pad, frame_h)
+    if x0 >= x1 or y0 >= y1:
+        # Face fully outside the frame
+        return
+
+    IM[:, 2] -= (x0, y0)
+    roi_size = (x1 - x0, y1 - y0)
+    img_white: "np.ndarray[Any, Any]" = np.full((crop_h, crop_w), 255, dtype=np.float32)
+    bgr_fake = cv2.warpAffine(bgr_fake, IM, roi_size, borderValue=0.0)
+    img_white = cv2.warpAffine(img_white, IM, roi_size, borderValue=0.0)
+    img_white[img_white > 20] = 255
+
+    img_mask: "np.ndarray[Any, Any]" = img_white
+    mask_h_inds, mask_w_inds = np.where(img_mask == 255)
+    if mask_h_inds.size == 0:
+        return
+    mask_h = np.max(mask_h_inds) - np.min(mask_h_inds)
+    mask_w = np.max(mask_w_inds) - np.min(mask_w_inds)
+    mask_size = int(np.sqrt(mask_h * mask_w))
+    k = max(mask_size // 10, 10)
+    img_mask = cv2.erode(img_mask, np.ones((k, k), np.uint8), iterations=1)
+    k = max(mask_size // 20, 5)
+    img_mask = cv2.GaussianBlur(img_mask, (2 * k + 1, 2 * k + 1), 0)
+    np.divide(img_mask, 255, out=img_mask)
+    img_mask = np.reshape(img_mask, [img_mask.shape[0], img_mask.shape[1], 1])
+
+    roi = frame[y0:y1, x0:x1]
+    fake_merged = img_mask * bgr_fake + (1 - img_mask) * roi.astype(np.float32)
+    roi[...] = fake_merged.astype(np.uint8)
+
+
 def process_frame(source_face: Face, temp_frame: Frame) -> Frame:
     if modules.globals.color_correction:
         temp_frame = cv2.cvtColor(temp_frame, cv2.COLOR_BGR2RGB)
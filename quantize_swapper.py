@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+One-off conversion of the inswapper_128 face swap model to fp16 or int8.
+
+Usage:
+    python quantize_swapper.py --precision int8
+    python quantize_swapper.py --precision int8 --calibration-dir uploads
+    python cloud-server/server.py --precision int8
+"""
+
+import argparse
+
+from modules.processors.frame import face_swapper
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the face swapper model to a lower precision")
+    parser.add_argument(
+        "--precision",
+        choices=["fp16", "int8"],
+        default="int8",
+        help="int8 for CPU, fp16 for CUDA (default: int8)"
+    )
+    parser.add_argument(
+        "--calibration-dir",
+        default=None,
+        help="Directory of face images for static int8 calibration; without it int8 is dynamic (default: none)"
+    )
+    args = parser.parse_args()
+
+    face_swapper.pre_check()
+    output_path = face_swapper.create_quantized_model(args.precision, args.calibration_dir)
+    print(f"Saved {args.precision} face swapper model: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,42 +2,89 @@
 
 import os
 import sys
+import argparse
 import asyncio
 import json
-import base64
 import io
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Union
 import logging
 import time
-
-# Set CPU execution and reduce logs before imports
-os.environ['OMP_NUM_THREADS'] = '1'
+import threading
+import itertools
+import struct
+import inspect
+import hashlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Roughly one thread per physical core (cpu_count counts hyperthreads); OpenMP reads
+# this once at import, so it has to be set before onnxruntime/torch are loaded
+CPU_THREADS = max(1, (os.cpu_count() or 2) // 2)
+os.environ['OMP_NUM_THREADS'] = str(CPU_THREADS)
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
 import cv2
 import numpy as np
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from PIL import Image
 import uvicorn
 
+try:
+    # Optional: libjpeg-turbo (SIMD) codec, ~2-3x faster than OpenCV's bundled libjpeg
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    turbo_jpeg = TurboJPEG()
+    # PyTurboJPEG >= 2.0 can compress into a caller-owned buffer
+    turbo_jpeg_dst = "dst" in inspect.signature(turbo_jpeg.encode).parameters
+except Exception:
+    turbo_jpeg = None
+    turbo_jpeg_dst = False
+
+try:
+    # Optional: faster JSON encoding for WebSocket text messages
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional: nvJPEG via nvImageCodec, used once the CUDA provider is selected
+    from nvidia import nvimgcodec
+except Exception:
+    nvimgcodec = None
+
 # Import Deep-Live-Cam modules
 import modules.globals
 import modules.metadata
-from modules.processors.frame.core import get_frame_processors_modules
-from modules.face_analyser import get_one_face
+from modules.processors.frame.core import get_frame_processors_modules, load_frame_processor_module
+from modules.face_analyser import get_one_face, get_many_faces
+from modules.processors.frame.face_swapper import swap_faces_batched, FRAME_SWAPPER_MUTATES_INPUT
+try:
+    from modules.processors.frame.face_enhancer import enhance_face
+except ImportError:
+    # Face enhancer (GFPGAN/torch) not installed
+    enhance_face = None
 from modules.utilities import is_image
 from modules.core import update_status
 
-# Configure for CPU-only processing
+# CPU by default; init_face_swapper() switches to CUDA when onnxruntime has it
 modules.globals.execution_providers = ['CPUExecutionProvider']
 modules.globals.frame_processors = ['face_swapper']
 modules.globals.headless = True
 modules.globals.many_faces = False
 modules.globals.nsfw_filter = False
 modules.globals.map_faces = False
+# Frames are detected at DETECTION_SCALE, so the detector input shrinks to match
+# (a 640x640 det_size would just upscale the half-size frame again).
+DETECTION_SCALE = 0.5
+modules.globals.detector_size = (320, 320)
+# Source uploads are full-size photos; detect them at insightface's usual size so small
+# faces are still found
+SOURCE_DETECTOR_SIZE = (640, 640)
+# Swapper precision on CPU, set by --cpu-swapper-precision; "int8" is faster but not yet
+# checked against fp32 output
+CPU_SWAPPER_PRECISION = "fp32"
 
 # Initialize FastAPI app
 app = FastAPI(title="Deep-Live-Cam Server", version="1.0.0")
@@ -53,6 +100,14 @@ app.add_middleware(
 
 # Global variables
 source_image_path = None
+source_image_cache = None
+source_face_cache = None
+# Content hash of the current source; /ws/watch viewers subscribe to frames swapped with it
+source_key: Optional[str] = None
+# /ws/watch channel without ?source=: whatever source is current when each frame is swapped
+CURRENT_SOURCE_CHANNEL = "current"
+# Serializes uploads; frames never take it, they just read source_face_cache once.
+source_upload_lock = asyncio.Lock()
 face_swapper = None
 connected_clients = set()
 
@@ -63,97 +118,449 @@ processing_params = {
     "target_fps": 30,
     "enable_face_enhancer": False,
     "max_faces": 1,
-    "processing_resolution": (640, 480)
+    "processing_resolution": (640, 480),
+    # Minimum time between background detections; frames in between reuse the last faces
+    "detection_interval_ms": 66
 }
 
+# Background face detection. The WebSocket loop hands frames to the detection thread
+# (latest frame per client wins) and swaps with whatever faces it found most recently,
+# so detection and swapping overlap instead of running back to back.
+# client id -> (frame id, faces)
+FACE_DETECTION_CACHE: Dict[int, tuple] = {}
+detection_lock = threading.Lock()
+# client id -> (frame id, frame) waiting for detection, and when each client was last detected
+pending_detections: Dict[int, tuple] = {}
+last_detection_at: Dict[int, float] = {}
+detection_ready = threading.Condition(detection_lock)
+detection_thread: Optional[threading.Thread] = None
+frame_ids = itertools.count()
+
+# /ws wire formats. Clients start on JPEG and can switch by sending
+# {"type": "hello", "format": "raw-bgr"}; raw-bgr frames (both directions) are an
+# 8-byte little-endian header (width u16, height u16, frame id u32) + packed BGR pixels.
+# A reply carries the frame id of the request it answers.
+WIRE_JPEG = "jpeg"
+WIRE_RAW_BGR = "raw-bgr"
+RAW_FRAME_HEADER = struct.Struct("<HHI")
+
+# Threads for the CPU-bound WebSocket stages (decode, swap, encode)
+EXECUTOR = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="ws-stage")
+# Moving average per pipeline stage, in ms
+stage_latency_ms: Dict[str, float] = {}
+
+def dumps_json(obj: Any) -> str:
+    """JSON text for WebSocket messages (kept as text frames so clients can tell them from images)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+class EncodeBuffer:
+    """Scratch buffer a reply is encoded into; recycled per connection once it has been sent."""
+
+    def __init__(self, size: int = 128 * 1024):
+        self.data = bytearray(size)
+
+    def reserve(self, size: int) -> bytearray:
+        if len(self.data) < size:
+            self.data = bytearray(size)
+        return self.data
+
 class ConnectionManager:
+    """Tracks sockets and owns their binary sends.
+
+    Each connection gets a send queue drained by a single writer task, so producers
+    never await a slow socket, no task is created per message and text and binary
+    sends never interleave. A new frame replaces one that is still waiting (newest
+    wins), so slow clients skip frames instead of building a backlog; text (control)
+    messages are never dropped.
+    """
+
     def __init__(self):
         self.active_connections: list[WebSocket] = []
+        # Text messages, or None for "send the connection's pending frame"
+        self.send_queues: Dict[WebSocket, asyncio.Queue] = {}
+        # (payload, buffer) of the frame waiting to be sent, per connection
+        self.pending_frames: Dict[WebSocket, tuple] = {}
+        self.writers: Dict[WebSocket, asyncio.Task] = {}
+        # Encode buffers not currently queued or being sent, per connection
+        self.free_buffers: Dict[WebSocket, list] = {}
+        # source key -> viewer sockets (frames reach them through their own send queue)
+        self.source_viewers: Dict[str, set] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.send_queues[websocket] = asyncio.Queue()
+        self.free_buffers[websocket] = []
+        self.writers[websocket] = asyncio.create_task(self._writer(websocket))
         connected_clients.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
         if websocket in self.active_connections:
             self.active_connections.remove(websocket)
+        self.send_queues.pop(websocket, None)
+        self.pending_frames.pop(websocket, None)
+        self.free_buffers.pop(websocket, None)
+        writer = self.writers.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+        for viewers in self.source_viewers.values():
+            viewers.discard(websocket)
         if websocket in connected_clients:
             connected_clients.remove(websocket)
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        try:
-            await websocket.send_text(message)
-        except:
-            self.disconnect(websocket)
+    async def _writer(self, websocket: WebSocket):
+        queue = self.send_queues[websocket]
+        while True:
+            message = await queue.get()
+            if message is not None:
+                try:
+                    await websocket.send_text(message)
+                except Exception:
+                    self.disconnect(websocket)
+                    return
+                continue
+            data, buffer = self.pending_frames.pop(websocket)
+            start = time.perf_counter()
+            try:
+                await websocket.send_bytes(data)
+            except Exception:
+                self.disconnect(websocket)
+                return
+            finally:
+                # send_bytes has framed (copied) the payload, so the buffer can be reused
+                self.release_buffer(websocket, buffer)
+            _record_stage("send", start)
+
+    def acquire_buffer(self, websocket: WebSocket) -> EncodeBuffer:
+        free = self.free_buffers.get(websocket)
+        return free.pop() if free else EncodeBuffer()
+
+    def release_buffer(self, websocket: WebSocket, buffer: Optional[EncodeBuffer]) -> None:
+        free = self.free_buffers.get(websocket)
+        if buffer is not None and free is not None:
+            free.append(buffer)
+
+    def queue_bytes(self, websocket: WebSocket, data: Union[bytes, memoryview], buffer: Optional[EncodeBuffer] = None):
+        """Hand a payload to the connection's writer without waiting; `buffer` is recycled after the send."""
+        queue = self.send_queues.get(websocket)
+        if queue is None:
+            self.release_buffer(websocket, buffer)
+            return
+        pending = self.pending_frames.get(websocket)
+        self.pending_frames[websocket] = (data, buffer)
+        if pending is not None:
+            # Still unsent: take over its place in the queue
+            self.release_buffer(websocket, pending[1])
+        else:
+            queue.put_nowait(None)
 
-    async def send_personal_bytes(self, data: bytes, websocket: WebSocket):
-        try:
-            await websocket.send_bytes(data)
-        except:
-            self.disconnect(websocket)
+    def queue_text(self, websocket: WebSocket, message: str) -> None:
+        """Hand a text message to the connection's writer; unlike frames it is never dropped."""
+        queue = self.send_queues.get(websocket)
+        if queue is not None:
+            queue.put_nowait(message)
+
+    def subscribe(self, key: str, websocket: WebSocket) -> None:
+        self.source_viewers.setdefault(key, set()).add(websocket)
+
+    def unsubscribe(self, key: str, websocket: WebSocket) -> None:
+        viewers = self.source_viewers.get(key)
+        if viewers is not None:
+            viewers.discard(websocket)
+            if not viewers:
+                del self.source_viewers[key]
+
+    def has_viewers(self, key: Optional[str]) -> bool:
+        return bool(self.source_viewers.get(key))
+
+    def broadcast_bytes(self, key: str, data: bytes) -> None:
+        """Queue one encoded frame (the same bytes object) for every viewer of `key`."""
+        for viewer in list(self.source_viewers.get(key, ())):
+            self.queue_bytes(viewer, data)
 
 manager = ConnectionManager()
 
+# JPEG codec for /ws: "nvimgcodec" (GPU), "turbojpeg" or "opencv"
+jpeg_codec = "turbojpeg" if turbo_jpeg is not None else "opencv"
+_nv_decoder = None
+_nv_encoder = None
+
+def select_execution_providers():
+    """Prefer CUDA when onnxruntime was built with it, and move the JPEG codec to the GPU too."""
+    global jpeg_codec, _nv_decoder, _nv_encoder
+    import onnxruntime
+
+    if 'CUDAExecutionProvider' not in onnxruntime.get_available_providers():
+        # The analyser and swapper build their sessions with these (modules.globals.session_options).
+        # Sequential execution: the swapper is one chain of convs, so the intra-op pool is
+        # what parallelises it; ORT_PARALLEL would only add scheduling overhead.
+        sess_options = onnxruntime.SessionOptions()
+        sess_options.intra_op_num_threads = CPU_THREADS
+        sess_options.inter_op_num_threads = 1
+        sess_options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+        sess_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        modules.globals.session_options = sess_options
+        return
+    modules.globals.execution_providers = ['CUDAExecutionProvider', 'CPUExecutionProvider']
+    if nvimgcodec is not None:
+        try:
+            _nv_decoder = nvimgcodec.Decoder()
+            _nv_encoder = nvimgcodec.Encoder()
+            jpeg_codec = "nvimgcodec"
+        except Exception as e:
+            print(f"nvImageCodec unavailable, keeping {jpeg_codec}: {e}")
+
+def select_swapper_precision(face_swapper_module: Any) -> None:
+    """Run the swapper in int8 on CPU with --cpu-swapper-precision int8 (fp32 by default).
+
+    int8 stays opt-in until its swaps are checked against fp32. GPU keeps fp32: the fp16
+    model is opt-in because of its known distortion issues.
+    """
+    if CPU_SWAPPER_PRECISION != "int8" or 'CUDAExecutionProvider' in modules.globals.execution_providers:
+        return
+    try:
+        # Statically calibrated on earlier uploads when there are any, dynamic otherwise
+        face_swapper_module.create_quantized_model("int8", calibration_dir="uploads")
+        modules.globals.swapper_precision = "int8"
+    except Exception as e:
+        print(f"int8 face swapper unavailable, using fp32: {e}")
+
 def init_face_swapper():
     """Initialize the face swapper model"""
     global face_swapper
     try:
+        # Must run before any model is loaded; sessions keep the providers they were built with
+        select_execution_providers()
         # Import and initialize frame processors
-        for frame_processor in get_frame_processors_modules(modules.globals.frame_processors):
+        frame_processors = get_frame_processors_modules(modules.globals.frame_processors)
+        for frame_processor in frame_processors:
             if not frame_processor.pre_check():
                 raise Exception(f"Pre-check failed for {frame_processor.NAME}")
             # Skip pre_start for now since it requires source path
 
-        # Get face swapper module
-        face_swapper_module = get_frame_processors_modules(['face_swapper'])[0]
+        # Get face swapper module from the list just loaded instead of resolving it again
+        face_swapper_module = next(
+            (module for module in frame_processors if module.__name__.endswith('.face_swapper')), None
+        ) or load_frame_processor_module('face_swapper')
         face_swapper = face_swapper_module
+        select_swapper_precision(face_swapper_module)
+        start_detection_thread()
         print("Face swapper initialized successfully")
         return True
     except Exception as e:
         print(f"Failed to initialize face swapper: {e}")
         return False
 
-def encode_image_to_base64(image_array: np.ndarray) -> str:
-    """Convert numpy array to base64 encoded image"""
-    _, buffer = cv2.imencode('.jpg', image_array)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
-    return img_base64
-
-def decode_base64_to_image(base64_string: str) -> np.ndarray:
-    """Convert base64 string to numpy array"""
-    img_data = base64.b64decode(base64_string)
-    img_array = np.frombuffer(img_data, np.uint8)
-    image = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-    return image
-
-def process_frame_with_face_swap(frame: np.ndarray) -> np.ndarray:
-    """Process a single frame with face swapping"""
-    global face_swapper, source_image_path
-
-    if not face_swapper or not source_image_path:
-        print(f"Skipping processing: face_swapper={face_swapper is not None}, source_image_path={source_image_path}")
-        return frame
+_FACE_POINT_FIELDS = ("bbox", "kps", "landmark_2d_106", "landmark_3d_68")
 
+def detect_faces(frame: np.ndarray) -> Any:
+    """Detect on a downscaled copy and map the faces back to full-frame coordinates.
+
+    Only the boxes and landmarks are scaled; the swap still crops from the full frame.
+    """
+    if DETECTION_SCALE >= 1.0:
+        return get_many_faces(frame)
+    small = cv2.resize(frame, None, fx=DETECTION_SCALE, fy=DETECTION_SCALE, interpolation=cv2.INTER_AREA)
+    faces = get_many_faces(small)
+    for face in faces or []:
+        for field in _FACE_POINT_FIELDS:
+            value = face.get(field)
+            if value is not None:
+                face[field] = value / DETECTION_SCALE
+    return faces
+
+def _next_detection() -> tuple:
+    """Wait for a client whose detection interval has passed; the longest-waiting goes first."""
+    with detection_ready:
+        while True:
+            now = time.monotonic()
+            interval = processing_params["detection_interval_ms"] / 1000.0
+            due_at = {
+                client_id: last_detection_at.get(client_id, 0.0) + interval
+                for client_id in pending_detections
+            }
+            due = [client_id for client_id, at in due_at.items() if at <= now]
+            if due:
+                client_id = min(due, key=due_at.__getitem__)
+                frame_id, frame = pending_detections.pop(client_id)
+                last_detection_at[client_id] = now
+                return client_id, frame_id, frame
+            detection_ready.wait(min(due_at.values()) - now if due_at else None)
+
+def _detection_worker():
+    while True:
+        client_id, frame_id, frame = _next_detection()
+        try:
+            faces = detect_faces(frame)
+        except Exception as e:
+            print(f"Background detection failed: {e}")
+            continue
+        with detection_lock:
+            # Only keep results for clients that are still connected and newer than the cached ones
+            cached = FACE_DETECTION_CACHE.get(client_id)
+            if cached is not None and cached[0] < frame_id:
+                FACE_DETECTION_CACHE[client_id] = (frame_id, faces)
+
+def start_detection_thread():
+    global detection_thread
+    if detection_thread is None:
+        detection_thread = threading.Thread(target=_detection_worker, name="face-detection", daemon=True)
+        detection_thread.start()
+
+def submit_for_detection(client_id: int, frame: np.ndarray) -> None:
+    """Queue a frame for background detection, replacing this client's frame still waiting."""
+    with detection_ready:
+        if client_id not in FACE_DETECTION_CACHE:
+            return
+        pending_detections[client_id] = (next(frame_ids), frame)
+        detection_ready.notify()
+
+def get_cached_faces(client_id: int, frame: np.ndarray) -> Any:
+    """Most recent background detection for this client; detects inline until there is one."""
+    with detection_lock:
+        cached = FACE_DETECTION_CACHE.get(client_id)
+    if cached is not None and cached[1] is not None:
+        return cached[1]
+    faces = detect_faces(frame)
+    with detection_lock:
+        if client_id in FACE_DETECTION_CACHE and FACE_DETECTION_CACHE[client_id][1] is None:
+            FACE_DETECTION_CACHE[client_id] = (-1, faces)
+    return faces
+
+def _put_latest(q: asyncio.Queue, item: Any) -> None:
+    """put_nowait that drops the oldest queued item when the queue is full."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except asyncio.QueueFull:
+            try:
+                q.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+
+def _record_stage(name: str, start: float) -> None:
+    """Fold one stage duration into its moving average (reported by /status)."""
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    previous = stage_latency_ms.get(name)
+    stage_latency_ms[name] = elapsed_ms if previous is None else 0.9 * previous + 0.1 * elapsed_ms
+
+def _negotiate_format(text: str, current: str) -> str:
+    """Apply a {"type": "hello", "format": ...} message; anything else keeps the current format."""
     try:
-        # Create a temporary copy for processing
-        temp_frame = frame.copy()
+        message = json.loads(text)
+    except ValueError:
+        return current
+    if isinstance(message, dict) and message.get("type") == "hello" and message.get("format") in (WIRE_JPEG, WIRE_RAW_BGR):
+        return message["format"]
+    return current
+
+def _decode_frame(data: bytes, resolution: tuple, wire_format: str = WIRE_JPEG) -> Optional[np.ndarray]:
+    if wire_format == WIRE_RAW_BGR:
+        frame = _unpack_raw_frame(data)
+    elif jpeg_codec == "nvimgcodec":
+        image = _nv_decoder.decode(data)
+        # nvJPEG decodes to RGB on the device; detection and swap work in BGR on the host
+        frame = None if image is None else np.ascontiguousarray(np.asarray(image.cpu())[:, :, ::-1])
+    elif turbo_jpeg is not None:
+        try:
+            frame = turbo_jpeg.decode(data, pixel_format=TJPF_BGR)
+        except Exception:
+            frame = None
+    else:
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        return None
+    # Resize frame based on processing resolution if needed
+    target_width, target_height = resolution
+    if frame.shape[1] != target_width or frame.shape[0] != target_height:
+        frame = cv2.resize(frame, (target_width, target_height))
+    return frame
+
+def _unpack_raw_frame(data: bytes) -> Optional[np.ndarray]:
+    """View a raw-bgr message as an (h, w, 3) frame; no image decode, no copy."""
+    if len(data) < RAW_FRAME_HEADER.size:
+        return None
+    width, height, _frame_id = RAW_FRAME_HEADER.unpack_from(data)
+    if len(data) - RAW_FRAME_HEADER.size < width * height * 3 or width == 0 or height == 0:
+        return None
+    return np.frombuffer(data, np.uint8, count=width * height * 3, offset=RAW_FRAME_HEADER.size).reshape(height, width, 3)
+
+def _raw_frame_id(data: bytes) -> int:
+    """Frame id from a raw-bgr message header, echoed back in the reply's header."""
+    if len(data) < RAW_FRAME_HEADER.size:
+        return 0
+    return RAW_FRAME_HEADER.unpack_from(data)[2]
+
+def _encode_frame(
+    frame: np.ndarray,
+    quality: int,
+    wire_format: str = WIRE_JPEG,
+    out: Optional[EncodeBuffer] = None,
+    frame_id: int = 0,
+) -> Union[bytes, memoryview]:
+    """Encode a reply; with `out`, into that connection's reused buffer where the codec allows.
+
+    raw-bgr replies carry `frame_id`, the id of the request frame they answer. The
+    returned view is only valid until the next call with the same `out`.
+    """
+    if wire_format == WIRE_RAW_BGR:
+        height, width = frame.shape[:2]
+        header = RAW_FRAME_HEADER.pack(width, height, frame_id & 0xFFFFFFFF)
+        if out is None:
+            return b"".join((header, np.ascontiguousarray(frame).data))
+        size = RAW_FRAME_HEADER.size + frame.nbytes
+        buf = out.reserve(size)
+        buf[:RAW_FRAME_HEADER.size] = header
+        np.frombuffer(buf, np.uint8, count=frame.nbytes, offset=RAW_FRAME_HEADER.size).reshape(frame.shape)[...] = frame
+        return memoryview(buf)[:size]
+    if jpeg_codec == "nvimgcodec":
+        rgb = np.ascontiguousarray(frame[:, :, ::-1])
+        return _nv_encoder.encode(rgb, "jpeg", params=nvimgcodec.EncodeParams(quality=quality))
+    if turbo_jpeg is not None:
+        if out is None or not turbo_jpeg_dst:
+            return turbo_jpeg.encode(frame, quality=quality, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+        buf = out.reserve(turbo_jpeg.buffer_size(frame, TJSAMP_420))
+        result, size = turbo_jpeg.encode(
+            frame, quality=quality, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420, dst=buf
+        )
+        return memoryview(result)[:size]
+    # OpenCV always returns its own array, so there is nothing to reuse here. No Huffman
+    # optimisation pass and no restart markers: both only cost encode time.
+    _, buffer = cv2.imencode('.jpg', frame, [
+        cv2.IMWRITE_JPEG_QUALITY, quality,
+        cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+        cv2.IMWRITE_JPEG_RST_INTERVAL, 0,
+    ])
+    # A flat byte view of the (N, 1) array avoids a tobytes() copy
+    return memoryview(buffer).cast('B')
+
+def process_frame_with_face_swap(frame: np.ndarray, client_id: Optional[int] = None) -> np.ndarray:
+    """Process a single frame with face swapping
+
+    With a client_id, target faces come from that client's background detections
+    instead of being detected on this frame.
+    """
+    global face_swapper
 
-        # Load source image
-        source_image = cv2.imread(source_image_path)
-        if source_image is None:
-            print(f"Failed to load source image: {source_image_path}")
-            return frame
+    # Source face is detected once at upload time; read the reference once so an
+    # upload landing mid-frame can't swap it out halfway through.
+    source_face = source_face_cache
+    if not face_swapper or source_face is None:
+        print(f"Skipping processing: face_swapper={face_swapper is not None}, source_face_cached={source_face is not None}")
+        return frame
 
-        # Get source face
-        source_face = get_one_face(source_image)
-        if not source_face:
-            print("No source face detected")
-            return frame
+    try:
+        # No defensive copy unless the swapper is known to write into its input
+        temp_frame = frame.copy() if FRAME_SWAPPER_MUTATES_INPUT else frame
 
         # Get target faces from current frame based on max_faces parameter
-        from modules.face_analyser import get_many_faces
-        all_target_faces = get_many_faces(temp_frame)
+        if client_id is None:
+            all_target_faces = detect_faces(temp_frame)
+        else:
+            all_target_faces = get_cached_faces(client_id, temp_frame)
 
         if not all_target_faces:
             print("No target faces detected in frame")
@@ -165,17 +572,14 @@ def process_frame_with_face_swap(frame: np.ndarray) -> np.ndarray:
 
         print(f"Processing {len(target_faces)} of {len(all_target_faces)} faces...")
 
-        # Process each face
-        for target_face in target_faces:
-            from modules.processors.frame.face_swapper import swap_face
-            temp_frame = swap_face(source_face, target_face, temp_frame)
+        # Swap all faces with one batched inference
+        temp_frame = swap_faces_batched(source_face, target_faces, temp_frame)
 
         # Apply face enhancement if enabled
-        if processing_params["enable_face_enhancer"]:
+        if processing_params["enable_face_enhancer"] and enhance_face is not None:
             try:
-                from modules.processors.frame.face_enhancer import enhance_face
-                for target_face in target_faces:
-                    temp_frame = enhance_face(target_face, temp_frame)
+                # GFPGAN enhances every face in the frame in one pass
+                temp_frame = enhance_face(temp_frame)
                 print("Face enhancement applied")
             except Exception as e:
                 print(f"Face enhancement failed: {e}")
@@ -188,10 +592,8 @@ def process_frame_with_face_swap(frame: np.ndarray) -> np.ndarray:
         traceback.print_exc()
         return frame
 
-@app.get("/")
-async def get_client():
-    """Serve the web client"""
-    html_content = """
+# Web client served at "/", encoded once at import instead of on every request
+_INDEX_HTML_BYTES = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -494,41 +896,70 @@ async def get_client():
         </script>
     </body>
     </html>
-    """
-    return HTMLResponse(content=html_content)
+    """.encode("utf-8")
+
+@app.get("/")
+async def get_client():
+    """Serve the web client"""
+    return Response(content=_INDEX_HTML_BYTES, media_type="text/html")
+
+# Keeps fire-and-forget upload saves referenced until they finish
+background_saves: set = set()
+
+def _write_file(path: str, content: bytes) -> None:
+    with open(path, "wb") as buffer:
+        buffer.write(content)
 
 @app.post("/upload-source")
 async def upload_source_image(file: UploadFile = File(...)):
     """Upload source image for face swapping"""
-    global source_image_path
+    global source_image_path, source_image_cache, source_face_cache, source_key
 
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
 
     try:
-        # Save uploaded file
-        uploads_dir = "uploads"
-        os.makedirs(uploads_dir, exist_ok=True)
+        async with source_upload_lock:
+            # Save uploaded file
+            uploads_dir = "uploads"
+            os.makedirs(uploads_dir, exist_ok=True)
 
-        source_image_path = os.path.join(uploads_dir, f"source_{file.filename}")
+            image_path = os.path.join(uploads_dir, f"source_{file.filename}")
 
-        with open(source_image_path, "wb") as buffer:
+            # Decode straight from the upload; the copy on disk is only kept for reference
             content = await file.read()
-            buffer.write(content)
-
-        # Verify it's a valid image with a face
-        test_image = cv2.imread(source_image_path)
-        if test_image is None:
-            raise HTTPException(status_code=400, detail="Invalid image file")
-
-        # Check if face is detected
-        face = get_one_face(test_image)
-        if not face:
-            raise HTTPException(status_code=400, detail="No face detected in source image")
+            loop = asyncio.get_running_loop()
+            # Decode and detect on the stage threads; OpenCV/ORT release the GIL, so
+            # other clients' frames keep flowing meanwhile
+            test_image = await loop.run_in_executor(
+                EXECUTOR, cv2.imdecode, np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR
+            )
+            if test_image is None:
+                raise HTTPException(status_code=400, detail="Invalid image file")
+
+            # Check if face is detected (off the event loop; detection takes tens of ms)
+            face = await loop.run_in_executor(
+                EXECUTOR, functools.partial(get_one_face, test_image, det_size=SOURCE_DETECTOR_SIZE)
+            )
+            if not face:
+                raise HTTPException(status_code=400, detail="No face detected in source image")
+
+            # Cache the decoded image and source face so frames don't re-read/re-detect it.
+            # Each is a single reference swap, so in-flight frames keep the old face.
+            source_image_path = image_path
+            source_image_cache = test_image
+            source_face_cache = face
+            source_key = hashlib.sha1(content).hexdigest()[:16]
+
+        save_task = asyncio.create_task(asyncio.to_thread(_write_file, image_path, content))
+        background_saves.add(save_task)
+        save_task.add_done_callback(background_saves.discard)
 
         print(f"Source image uploaded: {source_image_path}")
-        return {"message": "Source image uploaded successfully", "filename": file.filename}
+        return {"message": "Source image uploaded successfully", "filename": file.filename, "source_key": source_key}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
@@ -537,54 +968,157 @@ async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time video processing"""
     await manager.connect(websocket)
 
-    frame_counter = 0
-    last_frame_time = time.time()
+    client_id = id(websocket)
+    with detection_lock:
+        FACE_DETECTION_CACHE[client_id] = (-1, None)
 
-    try:
-        while True:
-            # Receive frame data
-            data = await websocket.receive_bytes()
+    loop = asyncio.get_running_loop()
+    # recv -> decode -> swap -> encode+send, each its own task so several frames are in
+    # flight. Received frames go into a single "latest frame" slot that each new frame
+    # overwrites, so a slow swap never lets a backlog (and seconds of lag) build up;
+    # the bounded queues after it drop their oldest frame.
+    latest_frame: Optional[tuple] = None
+    frame_ready = asyncio.Event()
+    decoded_frames: asyncio.Queue = asyncio.Queue(maxsize=1)
+    processed_frames: asyncio.Queue = asyncio.Queue(maxsize=2)
 
-            # Convert received data to image
-            img_array = np.frombuffer(data, np.uint8)
-            frame = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+    wire_format = WIRE_JPEG
 
+    async def recv_stage():
+        nonlocal wire_format, latest_frame
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                # The ASGI server hands over one immutable bytes object per message and
+                # owns the socket, so there is no recv_into() to point at a reusable
+                # buffer. Instead the payload itself is the buffer: imdecode/TurboJPEG
+                # and the raw-bgr np.frombuffer view read it in place, never copying it.
+                # Tag each frame with the format in effect when it arrived
+                latest_frame = (message["bytes"], wire_format)
+                frame_ready.set()
+            elif message.get("text") is not None:
+                wire_format = _negotiate_format(message["text"], wire_format)
+                manager.queue_text(websocket, dumps_json({"type": "format", "format": wire_format}))
+
+    async def decode_stage():
+        nonlocal latest_frame
+        frame_counter = 0
+        last_frame_time = 0.0
+        while True:
+            await frame_ready.wait()
+            data, frame_format = latest_frame
+            latest_frame = None
+            frame_ready.clear()
+            frame_counter += 1
+            current_time = time.time()
+
+            # Apply frame skipping based on dynamic parameters (before paying for the decode)
+            if frame_counter % processing_params["frame_skip"] != 0:
+                continue
+
+            # Apply FPS throttling
+            target_interval = 1.0 / processing_params["target_fps"]
+            if current_time - last_frame_time < target_interval:
+                continue
+            last_frame_time = current_time
+
+            start = time.perf_counter()
+            frame = await loop.run_in_executor(
+                EXECUTOR, _decode_frame, data, processing_params["processing_resolution"], frame_format
+            )
+            _record_stage("decode", start)
             if frame is not None:
-                frame_counter += 1
-                current_time = time.time()
-
-                # Apply frame skipping based on dynamic parameters
-                if frame_counter % processing_params["frame_skip"] != 0:
-                    continue
-
-                # Apply FPS throttling
-                target_interval = 1.0 / processing_params["target_fps"]
-                if current_time - last_frame_time < target_interval:
-                    continue
-
-                last_frame_time = current_time
+                frame_id = _raw_frame_id(data) if frame_format == WIRE_RAW_BGR else 0
+                _put_latest(decoded_frames, (frame, frame_format, frame_id))
 
-                # Resize frame based on processing resolution if needed
-                target_width, target_height = processing_params["processing_resolution"]
-                if frame.shape[1] != target_width or frame.shape[0] != target_height:
-                    frame = cv2.resize(frame, (target_width, target_height))
-
-                # Process frame with face swapping
-                processed_frame = process_frame_with_face_swap(frame)
-
-                # Encode processed frame back to bytes with dynamic quality
-                quality = processing_params["video_quality"]
-                _, buffer = cv2.imencode('.jpg', processed_frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
-
-                # Send processed frame back
-                await manager.send_personal_bytes(buffer.tobytes(), websocket)
+    async def swap_stage():
+        while True:
+            frame, frame_format, frame_id = await decoded_frames.get()
+            # Detection runs in the background; this frame is swapped with the latest result
+            submit_for_detection(client_id, frame.copy() if FRAME_SWAPPER_MUTATES_INPUT else frame)
+            start = time.perf_counter()
+            key = source_key
+            processed_frame = await loop.run_in_executor(EXECUTOR, process_frame_with_face_swap, frame, client_id)
+            _record_stage("swap", start)
+            _put_latest(processed_frames, (processed_frame, frame_format, frame_id, key))
+
+    async def send_stage():
+        while True:
+            processed_frame, frame_format, frame_id, key = await processed_frames.get()
+            # The buffer goes back to the manager's free list once the writer has sent it
+            encode_buffer = manager.acquire_buffer(websocket)
+            start = time.perf_counter()
+            payload = await loop.run_in_executor(
+                EXECUTOR,
+                _encode_frame,
+                processed_frame,
+                processing_params["video_quality"],
+                frame_format,
+                encode_buffer,
+                frame_id,
+            )
+            _record_stage("encode", start)
+            if frame_format == WIRE_JPEG:
+                channels = [key, CURRENT_SOURCE_CHANNEL if key == source_key else None]
+                channels = [channel for channel in channels if manager.has_viewers(channel)]
+                if channels:
+                    # Encoded once, shared by every viewer (one copy out of the reused buffer)
+                    data = bytes(payload)
+                    for channel in channels:
+                        manager.broadcast_bytes(channel, data)
+            if websocket not in manager.send_queues:
+                # The writer hit a dead socket; end the pipeline
+                raise WebSocketDisconnect(1006)
+            manager.queue_bytes(websocket, payload, encode_buffer)
+
+    stages = [
+        asyncio.create_task(recv_stage()),
+        asyncio.create_task(decode_stage()),
+        asyncio.create_task(swap_stage()),
+        asyncio.create_task(send_stage()),
+    ]
 
+    try:
+        await asyncio.gather(*stages)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
         print("Client disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
         manager.disconnect(websocket)
+    finally:
+        for stage in stages:
+            stage.cancel()
+        await asyncio.gather(*stages, return_exceptions=True)
+        # Idempotent; also stops this connection's writer task
+        manager.disconnect(websocket)
+        with detection_lock:
+            FACE_DETECTION_CACHE.pop(client_id, None)
+            pending_detections.pop(client_id, None)
+            last_detection_at.pop(client_id, None)
+
+@app.websocket("/ws/watch")
+async def watch_endpoint(websocket: WebSocket):
+    """View-only WebSocket: JPEG frames swapped with a source (?source=<key>, default: current)"""
+    await manager.connect(websocket)
+    # Without a key, follow the current source across uploads (also before the first one)
+    key = websocket.query_params.get("source") or CURRENT_SOURCE_CHANNEL
+    # Frames arrive through this socket's writer; all that's left here is waiting for the close
+    manager.subscribe(key, websocket)
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WebSocket viewer error: {e}")
+    finally:
+        manager.unsubscribe(key, websocket)
+        manager.disconnect(websocket)
 
 @app.post("/update-parameters")
 async def update_parameters(params: Dict[str, Any]):
@@ -619,6 +1153,10 @@ async def update_parameters(params: Dict[str, Any]):
             if "face_enhancer" in modules.globals.frame_processors:
                 modules.globals.frame_processors.remove("face_enhancer")
 
+    if "detection_interval_ms" in params and 0 <= params["detection_interval_ms"] <= 1000:
+        processing_params["detection_interval_ms"] = params["detection_interval_ms"]
+        updated_params["detection_interval_ms"] = params["detection_interval_ms"]
+
     if "max_faces" in params and 1 <= params["max_faces"] <= 10:
         processing_params["max_faces"] = params["max_faces"]
         updated_params["max_faces"] = params["max_faces"]
@@ -633,11 +1171,10 @@ async def update_parameters(params: Dict[str, Any]):
         "timestamp": str(asyncio.get_event_loop().time())
     }
 
-    for client in connected_clients:
-        try:
-            await manager.send_personal_message(json.dumps(notification), client)
-        except:
-            pass
+    # Serialized once for all clients and sent by each connection's writer
+    message = dumps_json(notification)
+    for client in list(connected_clients):
+        manager.queue_text(client, message)
 
     return {
         "status": "success",
@@ -667,13 +1204,25 @@ async def get_status():
         "execution_providers": modules.globals.execution_providers,
         "source_image": source_image_path is not None,
         "connected_clients": len(connected_clients),
+        "source_viewers": {key: len(viewers) for key, viewers in manager.source_viewers.items()},
         "face_swapper_initialized": face_swapper is not None,
-        "current_params": processing_params
+        "current_params": processing_params,
+        "stage_latency_ms": {name: round(ms, 2) for name, ms in stage_latency_ms.items()}
     }
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deep-Live-Cam Server")
+    parser.add_argument(
+        "--cpu-swapper-precision",
+        choices=["fp32", "int8"],
+        default="fp32",
+        help="Face swapper precision when running on CPU; int8 is created from the fp32 model on "
+             "first use, calibrated on the faces in uploads/. GPU always uses fp32 (default: fp32)"
+    )
+    args = parser.parse_args()
+    CPU_SWAPPER_PRECISION = args.cpu_swapper_precision
+
     print("Initializing Deep-Live-Cam Server...")
-    print("Execution providers:", modules.globals.execution_providers)
 
     # Initialize face swapper
     if init_face_swapper():
@@ -681,8 +1230,14 @@ if __name__ == "__main__":
     else:
         print("Failed to initialize face swapper - continuing anyway")
 
+    print("Execution providers:", modules.globals.execution_providers)
+    print("CPU threads (OpenMP / ORT intra-op):", CPU_THREADS)
+    print("Face swapper precision:", modules.globals.swapper_precision)
+    print("JPEG codec:", jpeg_codec)
+
     print("\nStarting server at http://localhost:8000")
     print("Open browser and navigate to http://localhost:8000")
     print("\nPress Ctrl+C to stop the server")
 
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
+    # Frames are already JPEG/raw; permessage-deflate would only burn CPU compressing them
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info", ws_per_message_deflate=False)
\ No newline at end of file
@@ -90,13 +90,15 @@ def main():
     print("Please wait for initialization...")
     print("\n" + "="*50)
 
-    # Start the server
-    try:
-        os.system(f"{sys.executable} server.py")
-    except KeyboardInterrupt:
-        print("\nServer stopped by user")
-    except Exception as e:
-        print(f"\nError starting server: {e}")
+    # Start the server by replacing this process: no intermediate shell, and Ctrl+C
+    # goes straight to the server. Flush first, exec discards buffered output.
+    sys.stdout.flush()
+    # Options such as --cpu-swapper-precision are passed through to server.py
+    server_cmd = [sys.executable, "server.py"] + sys.argv[1:]
+    if os.name == "nt":
+        # Windows emulates exec by spawning and exiting, which detaches the console
+        sys.exit(subprocess.call(server_cmd))
+    os.execv(sys.executable, server_cmd)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file